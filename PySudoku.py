@@ -1,20 +1,89 @@
 import sys, os, random, pygame
-sys.path.append(os.path.join("objects"))
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(here, "objects"))
 import SudokuSquare
 from GameResources import *
 
 digits = '123456789'
 rows = 'ABCDEFGHI'
 
+background_path = os.path.join(here, "images", "sudoku-board-bare.jpg")
 
-def play(values_list):
+# Size of a square's tile, and where its digit goes on it.
+tile_size = 45, 40
+text_offset = 17, 4
+
+
+def cell_origin(x, y):
+    """The top left corner of the square in column x and row y."""
+    startX = (x * 57) + (38, 99, 159)[x // 3]
+    startY = (y * 57) + (35, 100, 165)[y // 3]
+    return startX, startY
+
+
+def make_tiles():
+    """
+    Render the image of a square for each digit, and for an empty square.
+
+    Returns a dictionary of surfaces, keyed by digit or None, so that each
+    frame only has to blit them rather than render fonts and rounded
+    rectangles from scratch.
+    """
+    font = pygame.font.SysFont('opensans', 21)
+    tiles = {}
+    for number in [None] + list(digits):
+        color = (255, 255, 255) if number is None else (2, 204, 186)
+        tile = pygame.Surface(tile_size, pygame.SRCALPHA)
+        SudokuSquare.AAfilledRoundedRect(tile, ((0, 0), tile_size), color)
+        if number is not None:
+            tile.blit(font.render(number, 1, (255, 255, 255)), text_offset)
+        tiles[number] = tile
+    return tiles
+
+
+def render(screen, background, values_list):
+    """
+    Draw each of the frames in values_list onto screen, in turn.
+
+    Only the squares that differ from the frame before are redrawn: each
+    one is restored from the background, and its tile blitted over it.
+    Generates the list of rects changed by each frame; the first is the
+    whole screen.
+    """
+    tiles = make_tiles()
+    shown = {}
+    first = True
+    for values in values_list:
+        dirty = []
+        for y in range(9):
+            for x in range(9):
+                box = rows[y] + digits[x]
+                string_number = values[box]
+                number = string_number if len(string_number) == 1 else None
+                if number == '.':
+                    number = None
+                if box in shown and shown[box] == number:
+                    continue
+                shown[box] = number
+                rect = pygame.Rect(cell_origin(x, y), tile_size)
+                screen.blit(background, rect, rect)
+                screen.blit(tiles[number], rect)
+                dirty.append(rect)
+        if first:
+            dirty = [screen.get_rect()]
+            first = False
+        yield dirty
+
+
+def play(values_list, fps=5):
     pygame.init()
 
 
     size = width, height = 700, 700
     screen = pygame.display.set_mode(size)
 
-    background_image = pygame.image.load("./images/sudoku-board-bare.jpg").convert()
+    background_image = pygame.image.load(background_path).convert()
+    screen.blit(background_image, (0, 0))
 
     clock = pygame.time.Clock()
 
@@ -22,37 +91,10 @@ def play(values_list):
     # a random number to fill in here or accept user
     # input for a duplicatable puzzle.
 
-    for values in values_list:
+    for dirty in render(screen, background_image, values_list):
         pygame.event.pump()
-        theSquares = []
-        initXLoc = 0
-        initYLoc = 0
-        startX, startY, editable, number = 0, 0, "N", 0
-        for y in range(9):
-            for x in range(9):
-                if x in (0, 1, 2):  startX = (x * 57) + 38
-                if x in (3, 4, 5):  startX = (x * 57) + 99
-                if x in (6, 7, 8):  startX = (x * 57) + 159
-
-                if y in (0, 1, 2):  startY = (y * 57) + 35
-                if y in (3, 4, 5):  startY = (y * 57) + 100
-                if y in (6, 7, 8):  startY = (y * 57) + 165
-                col = digits[x]
-                row = rows[y]
-                string_number = values[row + col]
-                if len(string_number) > 1 or string_number == '' or string_number == '.':
-                    number = None
-                else:
-                    number = int(string_number)
-                theSquares.append(SudokuSquare.SudokuSquare(number, startX, startY, editable, x, y))
-
-        screen.blit(background_image, (0, 0))
-        for num in theSquares:
-            num.draw()
-
-        pygame.display.flip()
-        pygame.display.update()
-        clock.tick(5)
+        pygame.display.update(dirty)
+        clock.tick(fps)
 
     # leave game showing until closed by user
     while True:
@@ -61,6 +103,65 @@ def play(values_list):
                 pygame.quit()
                 quit()
 
+
+def save(values_list, path, fps=5):
+    """
+    Render the frames in values_list to files, without opening a window.
+
+    If path ends in '.gif', the frames are saved as an animated GIF, which
+    needs Pillow. Otherwise path is a pattern for a numbered sequence of
+    PNG files, such as 'replay/frame%04d.png'. Frames which don't change
+    the picture aren't saved; in a GIF, the frame before is shown for
+    longer instead.
+    Returns the number of frames saved.
+    """
+    gif = path.lower().endswith('.gif')
+    if not gif and '%' not in path:
+        raise ValueError("path needs a '%d' for the frame number, or to "
+                         "end in '.gif'")
+    pygame.font.init()
+    background = pygame.image.load(background_path)
+    screen = pygame.Surface(background.get_size())
+    screen.blit(background, (0, 0))
+    frames = render(screen, background, values_list)
+
+    if gif:
+        durations = []
+        images = _gif_images(screen, frames, 1000 // fps, durations)
+        first = next(images, None)
+        if first is not None:
+            first.save(path, save_all=True, append_images=images, loop=0)
+        return len(durations)
+
+    saved = 0
+    for dirty in frames:
+        if dirty:
+            pygame.image.save(screen, path % saved)
+            saved += 1
+    return saved
+
+
+def _gif_images(screen, frames, duration, durations):
+    # Generate a Pillow image of each frame that changes the picture, with
+    # how long to show it for. Each is held back until the next change, so
+    # its duration is known, and then added to durations.
+    from PIL import Image
+    image = None
+    for dirty in frames:
+        if not dirty:
+            if image is not None:
+                image.info['duration'] += duration
+            continue
+        if image is not None:
+            durations.append(image.info['duration'])
+            yield image
+        image = Image.frombytes('RGB', screen.get_size(),
+                                pygame.image.tobytes(screen, 'RGB'))
+        image.info['duration'] = duration
+    if image is not None:
+        durations.append(image.info['duration'])
+        yield image
+
 if __name__ == "__main__":
     main()
-    sys.exit()
\ No newline at end of file
+    sys.exit()
@@ -0,0 +1,136 @@
+"""
+Solve a file of Sudoku puzzles, one per line, writing each solution as it's
+found.
+
+Usage: python batch.py [options] [input [output]]
+
+Input and output default to stdin and stdout. Gzipped input is recognised
+and decompressed, and the output is gzipped if its name ends in '.gz'.
+Lines are read and written through large buffers, a line at a time, so
+memory use doesn't grow with the size of the corpus. Each solution is
+written as a line of symbols, in the order of the puzzles; puzzles with no
+solution get an empty line. Blank lines and lines starting with '#' are
+skipped. A summary of the throughput is printed to stderr at the end.
+
+With --cache, puzzles are solved through a cache.SolutionCache stored in
+the file given, so repeats of a puzzle, however relabelled or shuffled, are
+only solved once, in this run or any other using the same file.
+"""
+import argparse
+import gzip
+import io
+import sys
+import time
+
+import cache
+import parallel
+import utils
+
+buffer_size = 1 << 20
+
+
+def open_input(name):
+    """Open a file, or stdin for '-', as text, decompressing it if gzipped."""
+    if name == '-':
+        raw = sys.stdin.buffer
+    else:
+        raw = open(name, 'rb', buffer_size)
+    if raw.peek(2)[:2] == b'\x1f\x8b':
+        raw = io.BufferedReader(gzip.GzipFile(fileobj=raw), buffer_size)
+    return io.TextIOWrapper(raw, 'utf-8')
+
+
+def open_output(name):
+    """Open a file, or stdout for '-', for writing text; '.gz' names are gzipped."""
+    if name == '-':
+        raw = sys.stdout.buffer
+    elif name.endswith('.gz'):
+        raw = gzip.open(name, 'wb')
+    else:
+        raw = open(name, 'wb')
+    return io.TextIOWrapper(io.BufferedWriter(raw, buffer_size), 'utf-8')
+
+
+def read_grids(lines):
+    """Generate the puzzles in lines, skipping blanks and comments."""
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Solve Sudoku puzzles, one per line.')
+    parser.add_argument('input', nargs='?', default='-',
+                        help="file of puzzles, or '-' for stdin (default)")
+    parser.add_argument('output', nargs='?', default='-',
+                        help="file for the solutions, or '-' for stdout "
+                             "(default)")
+    parser.add_argument('--side', type=int, default=3,
+                        help='side of the sub-squares, 2 to 5 (default 3)')
+    parser.add_argument('--diagonal', action='store_true',
+                        help='the main diagonals are units too')
+    parser.add_argument('--engine', choices=utils.engines, default='string')
+    parser.add_argument('--wildcard', default='.',
+                        help="character for an empty box (default '.')")
+    parser.add_argument('--workers', type=int, default=0,
+                        help='solve across this many processes')
+    parser.add_argument('--chunksize', type=int, default=64,
+                        help='puzzles sent to a process at a time')
+    parser.add_argument('--cache',
+                        help='file of solutions to reuse and add to')
+    args = parser.parse_args(argv)
+    if args.cache and args.workers:
+        parser.error('--cache only works without --workers')
+
+    fns = utils.init(args.side, args.wildcard, args.diagonal,
+                     engine=args.engine)
+    infile = open_input(args.input)
+    outfile = open_output(args.output)
+
+    grids = read_grids(infile)
+    if args.workers:
+        solutions = parallel.solve_many(grids, args.side, args.diagonal,
+                                        args.engine, args.workers,
+                                        args.chunksize, wildcard=args.wildcard)
+    elif args.cache:
+        solutions_cache = cache.SolutionCache(args.side, args.diagonal,
+                                              args.engine, path=args.cache)
+        solutions = (solutions_cache.solve(fns['grid_values'](grid))
+                     for grid in grids)
+    else:
+        solutions = (fns['search'](fns['grid_values'](grid)) for grid in grids)
+
+    solved = unsolved = 0
+    start = time.perf_counter()
+    try:
+        for values in solutions:
+            if values:
+                outfile.write(fns['values_string'](values))
+                solved += 1
+            else:
+                unsolved += 1
+            outfile.write('\n')
+    finally:
+        # Leave stdin and stdout open for the caller.
+        if args.output == '-':
+            outfile.detach().detach()
+        else:
+            outfile.close()
+        if args.input == '-':
+            infile.detach()
+        else:
+            infile.close()
+        if args.cache:
+            solutions_cache.close()
+    elapsed = time.perf_counter() - start
+
+    total = solved + unsolved
+    sys.stderr.write('%d puzzles (%d with no solution) in %.2f seconds: '
+                     '%.1f puzzles/sec\n' % (total, unsolved, elapsed,
+                                             total / elapsed if elapsed else 0))
+
+
+if __name__ == '__main__':
+    main()
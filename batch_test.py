@@ -0,0 +1,64 @@
+import batch
+import contextlib
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestBatch(unittest.TestCase):
+
+    easy = '..3.2.6..9..3.5..1..18.64....81.29..7.......8..67.82....26.95..8..2.3..9..5.1.3..'
+    solved = '483921657967345821251876493548132976729564138136798245372689514814253769695417382'
+    clash = '88' + '.' * 79
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.lines = ['# A comment', self.easy, '', self.clash, self.easy]
+        self.check = [self.solved, '', self.solved]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_batch(self, infile, outfile, *args):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            batch.main([infile, outfile] + list(args))
+        self.assertIn('3 puzzles (1 with no solution)', stderr.getvalue())
+
+    def test_text(self):
+        infile = os.path.join(self.dir, 'puzzles.txt')
+        outfile = os.path.join(self.dir, 'solutions.txt')
+        with open(infile, 'w') as f:
+            f.write('\n'.join(self.lines))
+        for engine in ['string', 'bitmask', 'dlx']:
+            self.run_batch(infile, outfile, '--engine', engine)
+            with open(outfile) as f:
+                self.assertEqual(f.read().splitlines(), self.check)
+
+    def test_gzip(self):
+        infile = os.path.join(self.dir, 'puzzles')
+        outfile = os.path.join(self.dir, 'solutions.gz')
+        with gzip.open(infile, 'wt') as f:
+            f.write('\n'.join(self.lines).replace('.', '0'))
+        self.run_batch(infile, outfile, '--wildcard', '0', '--workers', '2',
+                       '--chunksize', '1')
+        with gzip.open(outfile, 'rt') as f:
+            self.assertEqual(f.read().splitlines(), self.check)
+
+    def test_cache(self):
+        infile = os.path.join(self.dir, 'puzzles.txt')
+        outfile = os.path.join(self.dir, 'solutions.txt')
+        with open(infile, 'w') as f:
+            f.write('\n'.join(self.lines))
+        for _ in range(2):
+            self.run_batch(infile, outfile, '--cache',
+                           os.path.join(self.dir, 'cache'))
+            with open(outfile) as f:
+                self.assertEqual(f.read().splitlines(), self.check)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+"""
+Compare the speed and memory use of the different ways of searching.
+
+Usage: python benchmark.py [--json FILE] [--baseline FILE] [--tolerance T]
+                           [--puzzle NAME]... [--engine NAME]...
+
+Every puzzle of the corpus below is solved by each engine, in each search
+mode, and a table of the results printed. With --json, the results are
+also written out as a list of objects, one per row of the table. With
+--baseline, they're compared with those saved from an earlier run, and
+any puzzle that is now solved more than T (by default 25%) more slowly,
+or takes more than T more memory, or takes a different number of nodes,
+is reported as a regression; the exit status is then 1.
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+import utils
+
+# (name, side, diagonal, grid)
+puzzles = [
+    ('4x4', 2, False, '3..2..1..2..4..1'),
+    ('9x9 easy', 3, False,
+     '..3.2.6..9..3.5..1..18.64....81.29..7.......8..67.82....26.95..8..2.3..9..5.1.3..'),
+    ('9x9 diagonal', 3, True,
+     '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'),
+    ('9x9 hard', 3, False,
+     '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..'),
+    # The puzzle from utils_test's test_hexa.
+    ('16x16', 4, False,
+     '4.e...31f..6.a.73..b.f.81.....5..1..b....d....0.d.9.e.....2....4'
+     '...064..b..13c....f........e.1.983..0.....f..56..759.1.c..48.b.2'
+     '....9.....c.7.8.c....2..e.6.af..5.2..68.9.a.c....b..40..8....6.e'
+     '...c.5.....a.0.3..1.786.....2..dfe..1.a..6db...52....39.....6.b.'),
+    ('25x25', 5, False,
+     '...456.8.0.bc...g....lmn.klm.o23451..7..a..def....06..9.c.e...hijkl.n...3..'
+     'abc.e...j...mno12..5..7.9f..ij.mn.k1.3.50..89.b.de34..1a..c2......mi......g'
+     '.5k..m.9djo........4......n.h.14..3b9.......0ci...da..6...h87.2.f9n53......'
+     '..2c.0.o.i..45md.ghk38.......0k8.14.5lm.gc..b..oh...5.cj...l8..k.29d..g.i..'
+     '.d.1..5c3m...j78...i6.2fa...3m.97bg...o..0ek64d.jlbhjlnid.....0f.7.4a....kc'
+     '60...3eg.......n...aho..4.81.hc0.l9....4.5..2d.k.f..dm2..ha6..5e0.8.o.9.n..'
+     '.9......k..a..n.hl.1e...0.c...f..n.........97.j.a1....8...mbn7kg6...5lj.90.'
+     'h..9.7f0.cm..1b.aoe.lk5.2jklb.5216.4.ac.3..m...fon..n..9k.g..3..i642...cb..'
+     '.10f...l.n5o.h.j..c8.a..3'),
+]
+
+engines = list(utils.engines)
+modes = ['copy', 'trail']
+
+# Keep solving a puzzle for at least this many seconds, to time it.
+min_time = 0.2
+
+
+def measure(fns, grid, mode):
+    """
+    Solve grid repeatedly, returning a dictionary of its results.
+
+    The timed runs and the memory run are separate, as tracing allocations
+    slows the search down several times over.
+    """
+    stats = {}
+    fns['search'](fns['grid_values'](grid), mode, stats)
+
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        fns['search'](fns['grid_values'](grid), mode)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+
+    values = fns['grid_values'](grid)
+    tracemalloc.start()
+    fns['search'](values, mode)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'nodes': stats['nodes'],
+            'seconds': elapsed / runs,
+            'puzzles_per_sec': runs / elapsed,
+            'nodes_per_sec': stats['nodes'] * runs / elapsed,
+            'peak_kib': peak / 1024.}
+
+
+def run(names=None, engine_names=None):
+    """
+    Benchmark the puzzles and engines named (all of them by default),
+    generating the results as they're measured.
+    """
+    for name, side, diagonal, grid in puzzles:
+        if names and name not in names:
+            continue
+        for engine in engine_names or engines:
+            fns = utils.init(side, diagonal=diagonal, engine=engine)
+            for mode in modes:
+                result = {'puzzle': name, 'engine': engine, 'mode': mode}
+                result.update(measure(fns, grid, mode))
+                yield result
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Compare results with a baseline from an earlier run.
+
+    Returns a list of messages, one for each regression found.
+    """
+    key = lambda r: (r['puzzle'], r['engine'], r['mode'])
+    before = dict((key(r), r) for r in baseline)
+    regressions = []
+    for result in results:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        label = '%s %s %s' % key(result)
+        if result['nodes'] != old['nodes']:
+            regressions.append('%s: %d nodes, was %d' % (
+                label, result['nodes'], old['nodes']))
+        if result['puzzles_per_sec'] < old['puzzles_per_sec'] * (1 - tolerance):
+            regressions.append('%s: %.1f puzzles/sec, was %.1f' % (
+                label, result['puzzles_per_sec'], old['puzzles_per_sec']))
+        if result['peak_kib'] > old['peak_kib'] * (1 + tolerance):
+            regressions.append('%s: peak %.1f KiB, was %.1f' % (
+                label, result['peak_kib'], old['peak_kib']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the Sudoku engines.')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline',
+                        help='compare with results saved by --json')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='fraction slower or bigger to allow')
+    parser.add_argument('--puzzle', action='append',
+                        choices=[p[0] for p in puzzles],
+                        help='benchmark only this puzzle (repeatable)')
+    parser.add_argument('--engine', action='append', choices=engines,
+                        help='benchmark only this engine (repeatable)')
+    args = parser.parse_args(argv)
+
+    header = '%-14s %-8s %-6s %8s %10s %12s %12s %10s'
+    row = '%-14s %-8s %-6s %8d %10.4f %12.1f %12.0f %10.1f'
+    print(header % ('puzzle', 'engine', 'mode', 'nodes', 'seconds',
+                    'puzzles/sec', 'nodes/sec', 'peak KiB'))
+    results = []
+    for result in run(args.puzzle, args.engine):
+        print(row % tuple(result[k] for k in (
+            'puzzle', 'engine', 'mode', 'nodes', 'seconds',
+            'puzzles_per_sec', 'nodes_per_sec', 'peak_kib')))
+        results.append(result)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for message in regressions:
+            print('REGRESSION ' + message)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
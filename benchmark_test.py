@@ -0,0 +1,65 @@
+import benchmark
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.min_time = benchmark.min_time
+        benchmark.min_time = 0
+
+    def tearDown(self):
+        benchmark.min_time = self.min_time
+        shutil.rmtree(self.dir)
+
+    def main(self, *args):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            status = benchmark.main(['--puzzle', '4x4'] + list(args))
+        return status, stdout.getvalue()
+
+    def test_json(self):
+        path = os.path.join(self.dir, 'results.json')
+        status, output = self.main('--json', path)
+        self.assertEqual(status, 0)
+        with open(path) as f:
+            results = json.load(f)
+        self.assertEqual(len(results),
+                         len(benchmark.engines) * len(benchmark.modes))
+        for result in results:
+            self.assertEqual(result['puzzle'], '4x4')
+            self.assertGreater(result['puzzles_per_sec'], 0)
+            self.assertGreater(result['peak_kib'], 0)
+
+        # Against itself, with some slack for noise, nothing has regressed;
+        # against a baseline ten times faster, everything has.
+        status, output = self.main('--baseline', path, '--tolerance', '0.9')
+        self.assertEqual(status, 0)
+        for result in results:
+            result['puzzles_per_sec'] *= 10
+        with open(path, 'w') as f:
+            json.dump(results, f)
+        status, output = self.main('--baseline', path)
+        self.assertEqual(status, 1)
+        self.assertEqual(output.count('REGRESSION'), len(results))
+
+    def test_compare(self):
+        old = {'puzzle': '4x4', 'engine': 'string', 'mode': 'copy',
+               'nodes': 3, 'puzzles_per_sec': 100., 'peak_kib': 10.}
+        new = dict(old, nodes=4, puzzles_per_sec=70., peak_kib=13.)
+        self.assertEqual(benchmark.compare([old], [old]), [])
+        self.assertEqual(len(benchmark.compare([new], [old])), 3)
+        self.assertEqual(len(benchmark.compare([new], [old], 0.35)), 1)
+        self.assertEqual(benchmark.compare([new], [dict(old, mode='trail')]),
+                         [])
+
+
+if __name__ == '__main__':
+    unittest.main()
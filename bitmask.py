@@ -0,0 +1,631 @@
+"""
+Integer bitmask versions of the Sudoku solving functions in utils.
+
+Internally a puzzle is a list of ints, one per box (in the order of `boxes`),
+with bit i of each int set if symbols[i] is still a candidate for that box.
+The public functions take and return the same {box: symbol-string}
+dictionaries as the string engine, so they can be swapped in wherever the
+functions returned by utils.init() are used.
+"""
+
+import time
+from itertools import islice
+
+import instrument
+from buckets import Buckets
+
+fn_type = type(lambda x:0)
+
+try:
+    popcount = int.bit_count
+except AttributeError:
+    def popcount(mask):
+        return bin(mask).count('1')
+
+
+def bits(mask):
+    """Split a mask into its single bit components, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low
+        mask ^= low
+
+
+def naked_subsets(masks, limit):
+    """
+    Find the naked subsets among the cells of a unit.
+
+    A naked subset is n unsolved cells whose candidates, between them,
+    number only n: those symbols must go in those cells, so can be removed
+    from every other cell of the unit. The cells needn't be identical, so
+    {12}, {23} and {13} form a naked triple.
+
+    Input:
+        - masks: The candidates of each cell in the unit.
+        - limit: The largest subset to look for.
+    Output: A list of (union of the candidates, positions of the cells in
+            masks) for each subset found.
+    """
+    cells = [(mask, i) for i, mask in enumerate(masks)
+             if mask & (mask - 1) and popcount(mask) <= limit]
+    found = []
+    # Grow subsets depth first, in order of position so that each is only
+    # visited once, abandoning any whose union gets too big.
+    stack = [(0, 0, ())]
+    while stack:
+        start, union, members = stack.pop()
+        for j in range(start, len(cells)):
+            mask, i = cells[j]
+            grown = union | mask
+            size = popcount(grown)
+            if size > limit:
+                continue
+            if size == len(members) + 1:
+                found.append((grown, members + (i,)))
+            else:
+                stack.append((j + 1, grown, members + (i,)))
+    return found
+
+
+def naked_removals(masks, num_siblings=None):
+    """
+    Find the candidates the naked subsets of a unit rule out.
+
+    Input:
+        - masks: The candidates of each cell in the unit.
+        - num_siblings: Only look for subsets of this size, by enumerating
+          them. By default, the subsets of every size are dealt with at
+          once: see _matching_removals().
+    Output: A dictionary of {position in masks: candidates to remove}, or
+            None if the unsolved cells can't all take different symbols.
+    """
+    if num_siblings is None:
+        return _matching_removals(masks)
+    removals = {}
+    for union, members in naked_subsets(masks, num_siblings):
+        if popcount(union) == num_siblings:
+            for pos, mask in enumerate(masks):
+                if mask & union and pos not in members:
+                    removals[pos] = removals.get(pos, 0) | (mask & union)
+    return removals
+
+
+def _matching_removals(masks):
+    # Enumerating the subsets of every size is exponential in the size of
+    # the unit, so instead match each unsolved cell with a different symbol,
+    # and keep only the candidates which appear in some such matching:
+    # those are exactly the ones no naked subset rules out. A candidate
+    # that isn't its cell's match is in another matching if the cell
+    # matched with it can take another candidate in turn, and so on, until
+    # either the chain gets back to the first cell, or to a symbol no cell
+    # is matched with.
+    cells = [mask for mask in masks if mask & (mask - 1)]
+    positions = [pos for pos, mask in enumerate(masks) if mask & (mask - 1)]
+    if not cells:
+        return {}
+    union = 0
+    for mask in cells:
+        union |= mask
+    if popcount(union) < len(cells):
+        return None
+
+    # Of a naked subset and the hidden subset of the symbols it leaves to
+    # the other cells, one has at most half the unsolved cells. So unless
+    # some n cells have at most n candidates, or some n symbols at most n
+    # places, for n up to half, there's nothing to find (nor any set of
+    # cells with too few candidates between them, other than all of them):
+    # which is usually the case while cells still have a lot of candidates.
+    half = len(cells) // 2
+    counts = sorted(popcount(mask) for mask in cells)
+    if all(counts[n - 1] > n for n in range(1, half + 1)):
+        # atleast[i] has the symbols with at least i places.
+        atleast = [0] * (half + 2)
+        for mask in cells:
+            for i in range(half + 1, 1, -1):
+                atleast[i] |= atleast[i - 1] & mask
+            atleast[1] |= mask
+        if all(popcount(atleast[1] & ~atleast[n + 1]) < n
+               for n in range(1, half + 1)):
+            return {}
+
+    match = [0] * len(cells)
+    owner = {}
+    # Most cells can be matched greedily.
+    taken = 0
+    for k, mask in enumerate(cells):
+        spare = mask & ~taken
+        if spare:
+            bit = spare & -spare
+            match[k] = bit
+            owner[bit] = k
+            taken |= bit
+    for k in range(len(cells)):
+        if not match[k] and not _augment(k, cells, match, owner):
+            return None
+
+    # Which cells each cell's other candidates lead to, as a mask, and
+    # which have a candidate no cell is matched with.
+    reach = []
+    escapes = 0
+    for k, mask in enumerate(cells):
+        leads = 0
+        for bit in bits(mask ^ match[k]):
+            other = owner.get(bit)
+            if other is None:
+                escapes |= 1 << k
+            else:
+                leads |= 1 << other
+        reach.append(leads)
+    # Warshall's transitive closure, a row of bits at a time.
+    for j in range(len(cells)):
+        row = reach[j]
+        bit = 1 << j
+        for k in range(len(cells)):
+            if reach[k] & bit:
+                reach[k] |= row
+
+    removals = {}
+    for k, mask in enumerate(cells):
+        for bit in bits(mask ^ match[k]):
+            other = owner.get(bit)
+            if other is None:
+                continue
+            around = reach[other] | 1 << other
+            if not (around & escapes or reach[other] >> k & 1):
+                pos = positions[k]
+                removals[pos] = removals.get(pos, 0) | bit
+    return removals
+
+
+def _augment(k, cells, match, owner):
+    # Match cell k with a symbol, rematching the cells along a shortest
+    # alternating path. Returns whether it could be matched.
+    parent = {}
+    seen = 0
+    frontier = [k]
+    while frontier:
+        cell = frontier.pop(0)
+        for bit in bits(cells[cell] & ~seen):
+            seen |= bit
+            parent[bit] = cell
+            other = owner.get(bit)
+            if other is None:
+                while True:
+                    cell = parent[bit]
+                    previous = match[cell]
+                    owner[bit] = cell
+                    match[cell] = bit
+                    if cell == k:
+                        return True
+                    bit = previous
+            frontier.append(other)
+    return False
+
+
+def init(side, symbols, boxes, unitlist, peers, lcv=False):
+    """
+    Create the bitmask engine's functions for a puzzle topology.
+
+    Takes the symbols, boxes, units and peers built by utils.init(), and
+    whether the search tries candidates least constraining first, and
+    returns a dictionary of function closures to be merged over the string
+    engine's functions.
+    """
+    dim = side * side
+    full = (1 << dim) - 1
+
+    index = dict((box, i) for i, box in enumerate(boxes))
+    unit_idx = [[index[box] for box in unit] for unit in unitlist]
+    peer_idx = [sorted(index[p] for p in peers[box]) for box in boxes]
+    cell_units = [[u for u, unit in enumerate(unit_idx) if i in unit]
+                  for i in range(len(boxes))]
+
+    # The string engine breaks ties between boxes with the same number of
+    # candidates by box name, so rank the indices the same way.
+    rank = [0] * len(boxes)
+    for r, box in enumerate(sorted(boxes)):
+        rank[index[box]] = r
+    # The search's Buckets number the cells by rank, to break ties the same.
+    by_rank = sorted(range(len(boxes)), key=rank.__getitem__)
+    rank_peers = [sorted(rank[p] for p in peer_idx[i]) for i in by_rank]
+
+    symbol_bit = dict((s, 1 << i) for i, s in enumerate(symbols))
+    bit_symbol = dict((1 << i, s) for i, s in enumerate(symbols))
+    _decoded = {}
+
+    def _encode(value):
+        mask = 0
+        for c in value:
+            try:
+                mask |= symbol_bit[c]
+            except KeyError:
+                raise ValueError('%r is not a symbol of this puzzle' % c)
+        return mask
+
+    def _decode(mask):
+        value = _decoded.get(mask)
+        if value is None:
+            value = ''.join(bit_symbol[b] for b in bits(mask))
+            _decoded[mask] = value
+        return value
+
+    def values_masks(values):
+        """Convert a dict of Sudoku values into a dict of {box: bitmask}."""
+        return dict((box, _encode(value)) for box, value in values.items())
+
+    def masks_values(masks):
+        """Convert a dict of {box: bitmask} back into Sudoku values."""
+        return dict((box, _decode(mask)) for box, mask in masks.items())
+
+    def _to_list(values):
+        return [_encode(values[box]) for box in boxes]
+
+    def _to_values(masks, values=None):
+        if values is None:
+            values = {}
+        for box, mask in zip(boxes, masks):
+            values[box] = _decode(mask)
+        return values
+
+    def _eliminate(masks, cells=None):
+        if cells is None:
+            cells = range(len(masks))
+        solved = [(i, masks[i]) for i in cells if popcount(masks[i]) == 1]
+        for i, mask in solved:
+            keep = ~mask
+            for peer in peer_idx[i]:
+                masks[peer] &= keep
+        return masks
+
+    def _only_choice(masks):
+        singles = []
+        for unit in unit_idx:
+            seen = twice = 0
+            for i in unit:
+                twice |= seen & masks[i]
+                seen |= masks[i]
+            for digit in bits(seen & ~twice):
+                for i in unit:
+                    if masks[i] & digit:
+                        singles.append((i, digit))
+                        break
+        for i, digit in singles:
+            masks[i] = digit
+        return masks
+
+    # The contents of each unit when _naked_siblings() last found nothing
+    # in it, keyed by (unit, num_siblings), so unchanged units are skipped.
+    _settled = {}
+
+    def _naked_siblings(masks, num_siblings=None):
+        for u, unit in enumerate(unit_idx):
+            key = (u, num_siblings)
+            contents = [masks[i] for i in unit]
+            if _settled.get(key) == contents:
+                continue
+            found = _naked_unit(masks, unit, None, None, num_siblings)
+            if found is None:
+                # The unit can't be completed; empty a cell to say so.
+                masks[min(unit, key=lambda i: popcount(masks[i]) < 2)] = 0
+            elif not found:
+                _settled[key] = contents
+        return masks
+
+    def _reduce(masks):
+        masks = _naked_siblings(masks)
+        masks = _only_choice(masks)
+        masks = _eliminate(masks)
+        return masks
+
+    def _hidden_singles(masks, unit, changed, trail):
+        seen = twice = 0
+        for i in unit:
+            twice |= seen & masks[i]
+            seen |= masks[i]
+        if seen != full:
+            # Some symbol has nowhere left to go in this unit.
+            return False
+        for digit in bits(seen & ~twice):
+            for i in unit:
+                if masks[i] & digit:
+                    if masks[i] != digit:
+                        if trail is not None:
+                            trail.append((i, masks[i]))
+                        masks[i] = digit
+                        changed.append(i)
+                    break
+        return True
+
+    def _naked_unit(masks, unit, changed, trail, num_siblings=None):
+        # Remove the candidates the unit's naked subsets rule out from its
+        # other cells. Returns whether any were removed, or None if the
+        # unit can't be completed.
+        removals = naked_removals([masks[i] for i in unit], num_siblings)
+        if removals is None:
+            return None
+        for pos, mask in removals.items():
+            i = unit[pos]
+            if trail is not None:
+                trail.append((i, masks[i]))
+            masks[i] &= ~mask
+            if changed is not None:
+                changed.append(i)
+        return bool(removals)
+
+    def _candidates(masks):
+        return sum(popcount(mask) for mask in masks)
+
+    def _propagate(masks, queue=None, trail=None, stats=None):
+        """
+        Propagate the consequences of changes to the given cells.
+
+        Works from a queue of changed cells, rather than rescanning the whole
+        board: a solved cell's symbol is eliminated from its peers, and the
+        units of every changed cell are checked for hidden singles. Only when
+        that has run dry are the touched units checked for naked siblings.
+        Returns the masks at the fixpoint, or False on a contradiction.
+
+        If a trail list is given, the (cell, old mask) of every change made
+        is appended to it, so the changes can be undone with _undo(). If a
+        stats dict is given, each round of checking units is counted in it.
+        """
+        if queue is None:
+            queue = list(range(len(masks)))
+        else:
+            queue = list(queue)
+        dirty = set()
+        naked_dirty = set()
+
+        while queue:
+            if stats is not None:
+                stats['rounds'] += 1
+            while queue:
+                i = queue.pop()
+                mask = masks[i]
+                if not mask:
+                    return False
+                dirty.update(cell_units[i])
+                if mask & (mask - 1):
+                    continue
+                keep = ~mask
+                for peer in peer_idx[i]:
+                    if masks[peer] & mask:
+                        if trail is not None:
+                            trail.append((peer, masks[peer]))
+                        masks[peer] &= keep
+                        if not masks[peer]:
+                            return False
+                        queue.append(peer)
+
+            naked_dirty |= dirty
+            for u in dirty:
+                if not _hidden_singles(masks, unit_idx[u], queue, trail):
+                    return False
+            dirty.clear()
+
+            if not queue:
+                for u in naked_dirty:
+                    if _naked_unit(masks, unit_idx[u], queue, trail) is None:
+                        return False
+                naked_dirty.clear()
+        return masks
+
+    def _reduce_puzzle(masks):
+        return _propagate(masks)
+
+    def _propagator(stats):
+        # _propagate(), or if there's a stats dict, a version adding to it.
+        if stats is None:
+            return _propagate
+        def propagate(masks, queue=None, trail=None):
+            return _propagate(masks, queue, trail, stats)
+        return instrument.wrap(propagate, 'propagate', stats, _candidates)
+
+    def _undo(masks, trail, mark):
+        while len(trail) > mark:
+            i, mask = trail.pop()
+            masks[i] = mask
+
+    def _buckets(masks):
+        return Buckets([popcount(masks[i]) for i in by_rank], rank_peers)
+
+    def _moved(masks, changes):
+        # The (rank, new count) of each cell in a list of (cell, old mask).
+        return [(rank[i], popcount(masks[i])) for i, _ in changes]
+
+    def _digits(masks, i):
+        # The candidates of cell i, in the order to try them: with lcv,
+        # those in the fewest of its unsolved peers first.
+        digits = list(bits(masks[i]))
+        if lcv:
+            open_peers = [masks[p] for p in peer_idx[i]
+                          if masks[p] & (masks[p] - 1)]
+            digits.sort(key=lambda d: sum(1 for m in open_peers if m & d))
+        return digits
+
+    def _solutions(masks, stats=None):
+        # Depth-first search, keeping the choices still to be tried on an
+        # explicit stack rather than recursing. Each stack entry is (masks,
+        # buckets, cell, candidates left to try in that cell). The changes
+        # propagation makes are collected as a trail, though never undone,
+        # so that only the cells changed need moving in the buckets.
+        propagate = _propagator(stats)
+        changed = None
+        touched = []
+        buckets = None
+        stack = []
+        while True:
+            if stats is not None:
+                stats['nodes'] += 1
+                stats['max_depth'] = max(stats['max_depth'], len(stack))
+            masks = propagate(masks, changed, touched)
+            if masks:
+                if buckets is None:
+                    buckets = _buckets(masks)
+                else:
+                    buckets.update(_moved(masks, touched))
+                cell = buckets.best()
+                if cell is None:
+                    yield masks
+                else:
+                    i = by_rank[cell]
+                    stack.append((masks, buckets, i, _digits(masks, i)))
+            elif stats is not None:
+                stats['backtracks'] += 1
+
+            while stack and not stack[-1][3]:
+                stack.pop()
+            if not stack:
+                return
+            parent, buckets, i, digits = stack[-1]
+            stack[-1] = (parent, buckets, i, digits[1:])
+            masks = parent[:]
+            if digits[1:]:
+                # The last digit can have the parent's buckets.
+                buckets = buckets.copy()
+            touched = [(i, masks[i])]
+            masks[i] = digits[0]
+            changed = [i]
+
+    def _search_trail(masks, stats):
+        # As _solutions(), but in place. Each stack entry is (cell,
+        # candidates left to try, trail length before the cell was
+        # assigned). The buckets are kept up to date with the cells on the
+        # trail: those changed by a propagation that succeeds, and those
+        # put back by an undo.
+        propagate = _propagator(stats)
+        if stats is not None:
+            stats['nodes'] += 1
+        # Nothing above the root to backtrack to, so only start recording
+        # changes once we branch.
+        consistent = propagate(masks)
+        if consistent:
+            buckets = _buckets(masks)
+        trail = []
+        stack = []
+        while True:
+            if stats is not None and not consistent:
+                stats['backtracks'] += 1
+            if consistent:
+                cell = buckets.best()
+                if cell is None:
+                    return masks
+                i = by_rank[cell]
+                stack.append((i, _digits(masks, i), len(trail)))
+
+            while stack:
+                i, digits, mark = stack[-1]
+                undone = trail[mark:]
+                _undo(masks, trail, mark)
+                buckets.update(_moved(masks, undone))
+                if digits:
+                    break
+                stack.pop()
+            else:
+                return
+
+            stack[-1] = (i, digits[1:], mark)
+            trail.append((i, masks[i]))
+            masks[i] = digits[0]
+            if stats is not None:
+                stats['nodes'] += 1
+                stats['max_depth'] = max(stats['max_depth'], len(stack))
+            consistent = propagate(masks, [i], trail)
+            if consistent:
+                buckets.update(_moved(masks, trail[mark:]))
+
+    def eliminate(values, boxes=None):
+        """Bitmask version of eliminate(); see utils."""
+        if boxes is not None:
+            boxes = [index[box] for box in boxes]
+        return _to_values(_eliminate(_to_list(values), boxes), values)
+
+    def only_choice(values):
+        """Bitmask version of only_choice(); see utils."""
+        return _to_values(_only_choice(_to_list(values)), values)
+
+    def naked_siblings(values, num_siblings=None):
+        """Bitmask version of naked_siblings(); see utils."""
+        if num_siblings is not None:
+            assert 2 <= num_siblings <= (dim-1)
+        masks = _naked_siblings(_to_list(values), num_siblings)
+        return _to_values(masks, values)
+
+    def naked_twins(values):
+        """Bitmask version of naked_twins(); see utils."""
+        return naked_siblings(values, 2)
+
+    def reduce(values):
+        """One round of each of the reduction functions."""
+        return _to_values(_reduce(_to_list(values)), values)
+
+    def reduce_puzzle(values):
+        """Propagate every box's candidates to a fixpoint; see propagate()."""
+        masks = _reduce_puzzle(_to_list(values))
+        if not masks:
+            return False
+        return _to_values(masks, values)
+
+    def propagate(values, changed=None):
+        """
+        Reduce the puzzle by propagating the changes made to some boxes.
+
+        Input:
+            - values: A sudoku in dictionary form.
+            - changed: The boxes whose values have changed. Defaults to all
+              of them.
+        Output: The resulting sudoku in dictionary form, or False if a
+                contradiction was found.
+        """
+        if changed is not None:
+            changed = [index[box] for box in changed]
+        masks = _propagate(_to_list(values), changed)
+        if not masks:
+            return False
+        return _to_values(masks, values)
+
+    def search(values, mode='copy', stats=None):
+        """
+        Solve a Sudoku puzzle by using depth-first search and propagation.
+
+        Input:
+            - values: A sudoku in dictionary form.
+            - mode: 'copy' gives each branch of the search its own copy of
+              the puzzle; 'trail' changes a single copy in place, recording
+              each change on a trail and undoing them when it backtracks.
+            - stats: Optional dict of statistics to add to, as for the
+              string engine's search(). Propagation's strategies run
+              together here, so the candidates they remove and the time
+              they take are counted under 'propagate'.
+        Output: The solved sudoku in dictionary form, or None.
+        """
+        if mode not in ('copy', 'trail'):
+            raise ValueError("Unknown search mode %r" % mode)
+        if stats is not None:
+            instrument.start(stats)
+            start = time.perf_counter()
+        masks = _to_list(values)
+        if mode == 'copy':
+            masks = next(_solutions(masks, stats), None)
+        else:
+            masks = _search_trail(masks, stats)
+        if stats is not None:
+            instrument.add(stats, 'time', 'search', time.perf_counter() - start)
+        if masks:
+            return _to_values(masks)
+
+    def iter_solutions(values):
+        """Bitmask version of iter_solutions(); see utils."""
+        for masks in _solutions(_to_list(values)):
+            yield _to_values(masks)
+
+    def count_solutions(values, limit=2):
+        """Bitmask version of count_solutions(); see utils."""
+        solutions = _solutions(_to_list(values))
+        return sum(1 for _ in islice(solutions, limit))
+
+    functions = {}
+    for name, obj in locals().items():
+        if isinstance(obj, fn_type) and not name.startswith('_'):
+            functions[name] = obj
+    return functions
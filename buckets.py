@@ -0,0 +1,96 @@
+"""
+The unsolved cells of a puzzle, kept in order of how good they are to branch
+on, so that a search can pick its next cell without looking at them all.
+
+The best cell is the one with the fewest candidates (the minimum remaining
+values heuristic), and of those, the one with the most unsolved peers (the
+degree heuristic), whose value constrains the most others. Cells are kept in
+buckets by candidate count, and then by degree, and moved between them as
+their counts change, so finding the best means looking at one bucket rather
+than every cell.
+"""
+
+
+class Buckets(object):
+    """
+    The unsolved cells of a puzzle, bucketed by candidate count and degree.
+
+    Cells are identified by number, from 0 to n - 1; ties between cells
+    with the same count and degree go to the lowest. A cell with fewer than
+    two candidates is solved (or, with none, a contradiction), and is left
+    out of the buckets.
+
+    Input:
+        - counts: The number of candidates of each cell.
+        - peers: The cells that share a unit with each cell.
+    """
+
+    def __init__(self, counts, peers):
+        self.peers = peers
+        self.count = list(counts)
+        self.degree = [sum(1 for peer in cell_peers if self.count[peer] > 1)
+                       for cell_peers in peers]
+        # {candidate count: {degree: set of cells}}
+        self.levels = {}
+        for cell, count in enumerate(self.count):
+            if count > 1:
+                self._add(cell)
+
+    def _add(self, cell):
+        level = self.levels.setdefault(self.count[cell], {})
+        level.setdefault(self.degree[cell], set()).add(cell)
+
+    def _remove(self, cell):
+        level = self.levels[self.count[cell]]
+        bucket = level[self.degree[cell]]
+        bucket.remove(cell)
+        if not bucket:
+            del level[self.degree[cell]]
+            if not level:
+                del self.levels[self.count[cell]]
+
+    def update(self, changes):
+        """
+        Move cells whose candidate counts have changed.
+
+        Input: An iterable of (cell, its new count) pairs. Cells whose count
+               hasn't changed may be included; they're skipped.
+        """
+        for cell, count in changes:
+            old = self.count[cell]
+            if count == old:
+                continue
+            if old > 1:
+                self._remove(cell)
+            self.count[cell] = count
+            if count > 1:
+                self._add(cell)
+            if (old > 1) != (count > 1):
+                # The cell's been solved, or unsolved again by an undo, so
+                # its peers' degrees change.
+                step = 1 if count > 1 else -1
+                for peer in self.peers[cell]:
+                    if self.count[peer] > 1:
+                        self._remove(peer)
+                        self.degree[peer] += step
+                        self._add(peer)
+                    else:
+                        self.degree[peer] += step
+
+    def best(self):
+        """The cell to branch on next, or None if every cell is solved."""
+        if not self.levels:
+            return None
+        level = self.levels[min(self.levels)]
+        return min(level[max(level)])
+
+    def copy(self):
+        """A copy, to be updated independently of this one."""
+        other = Buckets.__new__(Buckets)
+        other.peers = self.peers
+        other.count = self.count[:]
+        other.degree = self.degree[:]
+        other.levels = dict((count, dict((degree, set(bucket))
+                                         for degree, bucket in level.items()))
+                            for count, level in self.levels.items())
+        return other
@@ -0,0 +1,49 @@
+import random
+import unittest
+
+from buckets import Buckets
+
+
+class TestBuckets(unittest.TestCase):
+
+    def setUp(self):
+        # The peers of each cell of a 9x9 puzzle, in row-major order.
+        unit = lambda i: (i // 9, 9 + i % 9, 18 + i // 27 * 3 + i % 9 // 3)
+        self.peers = [[j for j in range(81)
+                       if j != i and set(unit(i)) & set(unit(j))]
+                      for i in range(81)]
+
+    def best(self, counts):
+        # What Buckets.best() should give, by looking at every cell.
+        degree = lambda i: sum(1 for p in self.peers[i] if counts[p] > 1)
+        unsolved = [(count, -degree(i), i) for i, count in enumerate(counts)
+                    if count > 1]
+        if unsolved:
+            return min(unsolved)[2]
+
+    def test_updates(self):
+        rand = random.Random(21)
+        counts = [rand.randint(0, 9) for _ in range(81)]
+        buckets = Buckets(counts, self.peers)
+        saved = []
+        for step in range(2000):
+            self.assertEqual(buckets.best(), self.best(counts))
+            if step % 100 == 0:
+                saved.append((buckets.copy(), counts[:]))
+            changes = [(rand.randrange(81), rand.randint(0, 9))
+                       for _ in range(rand.randint(1, 5))]
+            buckets.update(changes)
+            for i, count in changes:
+                counts[i] = count
+        # Copies carry on independently.
+        for copy, copied in saved:
+            self.assertEqual(copy.best(), self.best(copied))
+            copy.update([(i, 1) for i in range(81)])
+            self.assertIsNone(copy.best())
+        self.assertEqual(buckets.degree,
+                         [sum(1 for p in self.peers[i] if counts[p] > 1)
+                          for i in range(81)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+A cache of solutions, shared between all the copies of a puzzle.
+
+A puzzle is looked up first just as it is, and then by its canonical form
+(see the canonical module), so that a puzzle seen before comes straight
+back, and one seen before with its symbols relabelled or its rows and
+columns shuffled only costs finding the canonical form, rather than a
+search. The most recently used solutions are kept in memory, and given a
+path, every canonical solution is stored on disk too, in a dbm database, to
+be shared with later runs.
+"""
+import dbm
+from collections import OrderedDict
+
+import utils
+
+
+class SolutionCache(object):
+    """
+    Solve puzzles of one topology, remembering their solutions.
+
+    Input:
+        - side, diagonal, engine: The puzzles' topology, and the engine to
+          solve them with, as for utils.init().
+        - maxsize: The most solutions to keep in memory; the least recently
+          used are forgotten first.
+        - path: The file to store canonical solutions in, created if need
+          be. None to keep them in memory only.
+    """
+
+    def __init__(self, side, diagonal=False, engine='string', maxsize=4096,
+                 path=None):
+        self.fns = utils.init(side, diagonal=diagonal, engine=engine)
+        self.maxsize = maxsize
+        # Stored solutions are keyed by topology as well as form.
+        self.prefix = '%d%s:' % (side, 'x' if diagonal else '')
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0}
+        self._empty = self.fns['grid_values']('.' * side ** 4)
+        self._memory = OrderedDict()
+        self._disk = dbm.open(path, 'c') if path else None
+
+    def __len__(self):
+        return len(self._memory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the on-disk store, if there is one."""
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+    def _values(self, grid):
+        # A grid string (with '.' for empty boxes, or none) as a dictionary.
+        values = self._empty.copy()
+        for box, c in zip(self._empty, grid):
+            if c != '.':
+                values[box] = c
+        return values
+
+    def _recall(self, grid):
+        # The solution remembered for a grid string, '' if it has none, or
+        # None if it isn't in memory.
+        solution = self._memory.get(grid)
+        if solution is not None:
+            self._memory.move_to_end(grid)
+        return solution
+
+    def _remember(self, grid, solution):
+        self._memory[grid] = solution
+        self._memory.move_to_end(grid)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _solve_canonical(self, form):
+        # The solution of a canonical form, from memory, disk or a search.
+        solution = self._recall(form)
+        if solution is not None:
+            self.stats['hits'] += 1
+            return solution
+        key = (self.prefix + form).encode()
+        stored = self._disk.get(key) if self._disk is not None else None
+        if stored is not None:
+            self.stats['disk_hits'] += 1
+            solution = stored.decode()
+        else:
+            self.stats['misses'] += 1
+            values = self.fns['search'](self._values(form))
+            solution = self.fns['values_string'](values) if values else ''
+            if self._disk is not None:
+                self._disk[key] = solution.encode()
+        self._remember(form, solution)
+        return solution
+
+    def solve(self, values):
+        """
+        Solve a Sudoku puzzle, from the cache if it's been seen before.
+
+        Input: A sudoku in dictionary form. Only the boxes with a single
+               value count as clues; the others are taken as empty.
+        Output: The solved sudoku in dictionary form, or None if there is
+                no solution.
+        """
+        fns = self.fns
+        grid = ''.join(value if len(value) == 1 else '.'
+                       for value in map(values.get, self._empty))
+        solution = self._recall(grid)
+        if solution is not None:
+            self.stats['hits'] += 1
+        else:
+            form, transform = fns['canonical_form'](values)
+            solution = self._solve_canonical(form)
+            if solution:
+                solved = fns['from_canonical'](self._values(solution),
+                                               transform)
+                solution = ''.join(solved[box] for box in self._empty)
+            self._remember(grid, solution)
+        if solution:
+            return self._values(solution)
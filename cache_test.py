@@ -0,0 +1,66 @@
+import cache
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestSolutionCache(unittest.TestCase):
+
+    hard = '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..'
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'solutions')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_solve(self):
+        with cache.SolutionCache(3) as solutions:
+            fns = solutions.fns
+            values = fns['grid_values'](self.hard)
+            answer = fns['search'](values.copy())
+            self.assertEqual(solutions.solve(values), answer)
+            self.assertEqual(solutions.solve(values), answer)
+            self.assertEqual(solutions.stats,
+                             {'hits': 1, 'disk_hits': 0, 'misses': 1})
+            # The same puzzle, transposed, is found by its canonical form.
+            grid = fns['values_string'](values)
+            transposed = ''.join(grid[c * 9 + r] for r in range(9)
+                                 for c in range(9))
+            solved = solutions.solve(fns['grid_values'](transposed))
+            self.assertEqual(fns['values_string'](solved),
+                             ''.join(fns['values_string'](answer)[c * 9 + r]
+                                     for r in range(9) for c in range(9)))
+            self.assertEqual(solutions.stats['hits'], 2)
+            self.assertEqual(solutions.stats['misses'], 1)
+
+            clash = fns['grid_values']('88' + '.' * 79)
+            self.assertIsNone(solutions.solve(clash))
+            self.assertIsNone(solutions.solve(clash))
+
+    def test_lru(self):
+        with cache.SolutionCache(2, maxsize=2) as solutions:
+            fns = solutions.fns
+            for grid in ['3..2..1..2..4..1', '1...............',
+                         '12..............']:
+                solutions.solve(fns['grid_values'](grid))
+                self.assertLessEqual(len(solutions), 2)
+
+    def test_disk(self):
+        with cache.SolutionCache(3, path=self.path) as solutions:
+            values = solutions.fns['grid_values'](self.hard)
+            answer = solutions.solve(values)
+        with cache.SolutionCache(3, path=self.path) as solutions:
+            self.assertEqual(solutions.solve(values), answer)
+            self.assertEqual(solutions.stats,
+                             {'hits': 0, 'disk_hits': 1, 'misses': 0})
+        # Stored solutions are kept apart by topology.
+        with cache.SolutionCache(3, diagonal=True, path=self.path) as solutions:
+            solutions.solve(values)
+            self.assertEqual(solutions.stats['misses'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import random
+import unittest
+import utils
+
+
+class TestCanonical(unittest.TestCase):
+
+    # The puzzles of different sizes from utils_test.
+    puzzles = [
+        (2, '3..2..1..2..4..1'),
+        (3, '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..'),
+        (4, '4.e...31f..6.a.73..b.f.81.....5..1..b....d....0.d.9.e.....2....4'
+            '...064..b..13c....f........e.1.983..0.....f..56..759.1.c..48.b.2'
+            '....9.....c.7.8.c....2..e.6.af..5.2..68.9.a.c....b..40..8....6.e'
+            '...c.5.....a.0.3..1.786.....2..dfe..1.a..6db...52....39.....6.b.'),
+    ]
+    diagonal = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+
+    def shuffle(self, fns, values, rows, cols, rand, flip=None):
+        # values moved so that row r comes from rows[r] and column c from
+        # cols[c], maybe transposed, with its symbols relabelled.
+        boxes = list(values)
+        symbols = fns['grid_values']('.' * len(boxes))[boxes[0]]
+        relabel = dict(zip(symbols, rand.sample(symbols, len(symbols))))
+        dim = len(rows)
+        if flip is None:
+            flip = rand.random() < 0.5
+        moved = {}
+        for r in range(dim):
+            for c in range(dim):
+                i, j = (c, r) if flip else (r, c)
+                source = values[boxes[rows[i] * dim + cols[j]]]
+                moved[boxes[r * dim + c]] = ''.join(
+                    sorted(relabel[s] for s in source))
+        return moved
+
+    def line_perm(self, side, rand):
+        # A random permutation of the lines that keeps bands together.
+        bands = rand.sample(range(side), side)
+        return [b * side + i for b in bands for i in rand.sample(range(side), side)]
+
+    def test_invariant(self):
+        rand = random.Random(22)
+        for side, grid in self.puzzles:
+            fns = utils.init(side)
+            values = fns['grid_values'](grid)
+            form, transform = fns['canonical_form'](values)
+            for _ in range(5):
+                shuffled = self.shuffle(fns, values, self.line_perm(side, rand),
+                                        self.line_perm(side, rand), rand)
+                self.assertEqual(fns['fingerprint'](shuffled), form)
+
+    def test_transform(self):
+        for side, grid in self.puzzles:
+            fns = utils.init(side)
+            values = fns['grid_values'](grid)
+            form, transform = fns['canonical_form'](values)
+            canonical = fns['to_canonical'](values, transform)
+            self.assertEqual(fns['values_string'](canonical), form)
+            self.assertEqual(fns['from_canonical'](canonical, transform),
+                             values)
+            # Solutions go back the same way.
+            solution = fns['search'](fns['grid_values'](form))
+            solution = fns['from_canonical'](solution, transform)
+            for box, value in values.items():
+                self.assertIn(solution[box], value)
+            self.assertEqual(fns['eliminate'](solution.copy()), solution)
+
+    def test_distinct(self):
+        fns = utils.init(3)
+        grid = self.puzzles[1][1]
+        form = fns['fingerprint'](fns['grid_values'](grid))
+        self.assertNotEqual(fns['fingerprint'](fns['grid_values']('.' + grid[1:])),
+                            form)
+        self.assertNotEqual(fns['fingerprint'](fns['grid_values'](self.diagonal)),
+                            form)
+
+    def test_filled(self):
+        # With every box filled, the lines are hard to tell apart.
+        fns = utils.init(3)
+        rand = random.Random(3)
+        solution = fns['search'](fns['grid_values'](self.puzzles[1][1]))
+        form = fns['fingerprint'](solution)
+        self.assertNotIn('.', form)
+        shuffled = self.shuffle(fns, solution, self.line_perm(3, rand),
+                                self.line_perm(3, rand), rand)
+        self.assertEqual(fns['fingerprint'](shuffled), form)
+        empty = fns['grid_values']('.' * 81)
+        self.assertEqual(fns['fingerprint'](empty), '.' * 81)
+
+    def test_diagonal(self):
+        rand = random.Random(5)
+        fns = utils.init(3, diagonal=True)
+        values = fns['grid_values'](self.diagonal)
+        form, transform = fns['canonical_form'](values)
+        # The same permutation of rows and columns, commuting with
+        # reversing them, or with the columns reversed as well, keeps the
+        # diagonals diagonals.
+        for rows in [list(range(9))[::-1],
+                     [6, 8, 7, 5, 4, 3, 1, 0, 2],
+                     [1, 0, 2, 5, 4, 3, 6, 8, 7]]:
+            for cols in [rows, rows[::-1]]:
+                shuffled = self.shuffle(fns, values, rows, cols, rand)
+                self.assertEqual(fns['fingerprint'](shuffled), form)
+        # The canonical form is a diagonal sudoku with the same solution.
+        solution = fns['search'](fns['grid_values'](form))
+        self.assertEqual(fns['from_canonical'](solution, transform),
+                         fns['search'](values))
+        # Swapping two columns on their own doesn't keep the diagonals, and
+        # makes a different puzzle.
+        cols = [1, 0, 2, 3, 4, 5, 6, 7, 8]
+        shuffled = self.shuffle(fns, values, list(range(9)), cols, rand)
+        self.assertNotEqual(fns['fingerprint'](shuffled), form)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+"""
+Dancing Links (Knuth's Algorithm X) version of the Sudoku search.
+
+A puzzle is an exact cover problem: every box must hold exactly one symbol,
+and every unit must hold each symbol exactly once. Each (box, symbol) pair
+still allowed by the puzzle becomes a row of a sparse 0/1 matrix, covering
+one column for its box and one for each (unit, symbol) pair it fills. The
+matrix is held as circular doubly linked lists, in flat lists of node
+indices, so that covering and uncovering columns is a matter of relinking.
+"""
+
+import time
+from itertools import islice
+
+import instrument
+
+fn_type = type(lambda x:0)
+
+
+def init(side, symbols, boxes, unitlist):
+    """
+    Create the DLX engine's functions for a puzzle topology.
+
+    Takes the symbols, boxes and units built by utils.init(), and returns a
+    dictionary of function closures to be merged over the string engine's
+    functions.
+    """
+    dim = side * side
+    num_boxes = len(boxes)
+    num_cols = num_boxes + len(unitlist) * dim
+
+    index = dict((box, i) for i, box in enumerate(boxes))
+    cell_units = [[] for _ in boxes]
+    for u, unit in enumerate(unitlist):
+        for box in unit:
+            cell_units[index[box]].append(u)
+
+    # The columns each (box, symbol) row covers, by box index and symbol.
+    row_cols = [[[i] + [num_boxes + u*dim + k for u in cell_units[i]]
+                 for k in range(dim)]
+                for i in range(num_boxes)]
+
+    def _exact_covers(values, stats=None):
+        """
+        Generate the exact covers of the matrix built from values.
+
+        Each cover is yielded as a list of (box index, symbol index) rows;
+        the list is reused, so copy it if you need to keep it. If a stats
+        dict is given, its 'nodes' entry counts the root and each row
+        selected, 'backtracks' each column found with no rows left, and
+        'max_depth' the most rows selected at once.
+        """
+        if stats is not None:
+            stats['nodes'] += 1
+        # Node 0 is the root; nodes 1..num_cols are the column headers.
+        size = num_cols + 1
+        L = [i - 1 for i in range(size)]
+        R = [i + 1 for i in range(size)]
+        L[0], R[-1] = size - 1, 0
+        U = list(range(size))
+        D = list(range(size))
+        C = list(range(size))
+        S = [0] * size
+        rows = [None] * size
+
+        for i, box in enumerate(boxes):
+            for c in values[box]:
+                k = symbols.index(c)
+                first = len(L)
+                for col in row_cols[i][k]:
+                    col += 1
+                    node = len(L)
+                    L.append(node - 1)
+                    R.append(node + 1)
+                    U.append(U[col])
+                    D.append(col)
+                    C.append(col)
+                    rows.append((i, k))
+                    D[U[col]] = node
+                    U[col] = node
+                    S[col] += 1
+                L[first] = len(L) - 1
+                R[-1] = first
+
+        def cover(c):
+            L[R[c]] = L[c]
+            R[L[c]] = R[c]
+            i = D[c]
+            while i != c:
+                j = R[i]
+                while j != i:
+                    U[D[j]] = U[j]
+                    D[U[j]] = D[j]
+                    S[C[j]] -= 1
+                    j = R[j]
+                i = D[i]
+
+        def uncover(c):
+            i = U[c]
+            while i != c:
+                j = L[i]
+                while j != i:
+                    S[C[j]] += 1
+                    U[D[j]] = j
+                    D[U[j]] = j
+                    j = L[j]
+                i = U[i]
+            L[R[c]] = c
+            R[L[c]] = c
+
+        def select(r):
+            j = R[r]
+            while j != r:
+                cover(C[j])
+                j = R[j]
+
+        def deselect(r):
+            j = L[r]
+            while j != r:
+                uncover(C[j])
+                j = L[j]
+
+        chosen = []
+        solution = []
+        while True:
+            if R[0] == 0:
+                yield solution
+            else:
+                # Choose the column with the fewest rows left in it.
+                c = best = R[0]
+                fewest = S[c]
+                while c and fewest:
+                    if S[c] < fewest:
+                        best, fewest = c, S[c]
+                    c = R[c]
+                if fewest:
+                    cover(best)
+                    r = D[best]
+                    select(r)
+                    chosen.append(r)
+                    solution.append(rows[r])
+                    if stats is not None:
+                        stats['nodes'] += 1
+                        stats['max_depth'] = max(stats['max_depth'],
+                                                 len(chosen))
+                    continue
+                if stats is not None:
+                    stats['backtracks'] += 1
+
+            # Backtrack to the deepest choice with another row to try.
+            while chosen:
+                r = chosen.pop()
+                solution.pop()
+                c = C[r]
+                deselect(r)
+                r = D[r]
+                if r != c:
+                    if stats is not None:
+                        stats['nodes'] += 1
+                    select(r)
+                    chosen.append(r)
+                    solution.append(rows[r])
+                    break
+                uncover(c)
+            else:
+                return
+
+    def _cover_values(solution):
+        return dict((boxes[i], symbols[k]) for i, k in solution)
+
+    def search(values, mode='copy', stats=None):
+        """
+        Solve a Sudoku puzzle with Dancing Links.
+
+        Input:
+            - values: A sudoku in dictionary form.
+            - mode: Accepted for compatibility with the other engines, and
+              either 'copy' or 'trail'. It makes no difference here: the
+              links are always covered in place and uncovered on
+              backtracking, and values itself is never changed.
+            - stats: Optional dict of statistics to add to, as for the
+              string engine's search(). Nodes are the root and each row
+              selected; there's no propagation, so only the counts of
+              nodes, backtracks, the maximum depth and the search time
+              are added to.
+        Output: The solved sudoku in dictionary form, or None if it has no
+                solution.
+        """
+        if mode not in ('copy', 'trail'):
+            raise ValueError("Unknown search mode %r" % mode)
+        if stats is not None:
+            instrument.start(stats)
+            start = time.perf_counter()
+        solution = next(_exact_covers(values, stats), None)
+        if stats is not None:
+            instrument.add(stats, 'time', 'search', time.perf_counter() - start)
+        if solution is not None:
+            return _cover_values(solution)
+
+    def iter_solutions(values):
+        """Generate the solutions of a Sudoku puzzle, one at a time."""
+        for solution in _exact_covers(values):
+            yield _cover_values(solution)
+
+    def count_solutions(values, limit=2):
+        """
+        Count the exact covers of a Sudoku puzzle.
+
+        Input:
+            - values: A sudoku in dictionary form.
+            - limit: Stop searching once this many solutions have been found.
+              None to count them all.
+        Output: The number of solutions found.
+        """
+        return sum(1 for _ in islice(_exact_covers(values), limit))
+
+    functions = {}
+    for name, obj in locals().items():
+        if isinstance(obj, fn_type) and not name.startswith('_'):
+            functions[name] = obj
+    return functions
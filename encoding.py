@@ -0,0 +1,184 @@
+"""
+Fixed-width binary encodings of Sudoku puzzles and candidate states, far
+smaller to store, or to send between processes, than grid strings or the
+dictionaries keyed by box name.
+
+A grid takes the fewest bits that hold a box's symbol number (1 to dim, or 0
+for no clue) for each box: 4 for a 9x9 puzzle, 5 for 16x16 or 25x25. A
+candidate state takes a bit for each symbol of each box, set if it's still a
+candidate. Boxes are in row-major order, and symbols in order, from the most
+significant bit of the first byte; the record is padded with zero bits to a
+whole number of bytes. Records of one kind are all the same size, so a
+buffer of them can be read in place, each record a memoryview slice of it.
+
+Encoding and decoding convert a whole record at once, mapping lookups over
+the boxes without a Python loop. A grid's record is converted to and from a
+string with a digit for each box, which its width makes octal, hex or base
+32, so that int, bytes.hex() or base64 do the conversion; a candidate
+state's goes through a string of its bits.
+"""
+import base64
+from functools import lru_cache
+from itertools import repeat
+
+fn_type = type(lambda x:0)
+
+
+def init(side, symbols, boxes):
+    """
+    Create the binary encoding functions for a puzzle topology.
+
+    Takes the symbols and the boxes (in row-major order) built by
+    utils.init(), and returns a dictionary of function closures.
+    """
+    dim = side * side
+    cells = len(boxes)
+    clue_bits = dim.bit_length()
+    sizes = {False: (cells * clue_bits + 7) // 8,
+             True: (cells * dim + 7) // 8}
+    grid_pad = sizes[False] * 8 - cells * clue_bits
+
+    # The digit for each box's clue, and the value each digit stands for; no
+    # clue is all of the symbols, as grid_values() gives.
+    digits = {3: '01234567', 4: '0123456789abcdef',
+              5: 'ABCDEFGHIJKLMNOPQRSTUVWXYZ234567'}[clue_bits]
+    clue_digit = dict((s, digits[i + 1]) for i, s in enumerate(symbols))
+    digit_value = dict((d, s) for s, d in clue_digit.items())
+    digit_value[digits[0]] = symbols
+    symbol_bit = dict((s, 1 << (dim - 1 - i)) for i, s in enumerate(symbols))
+    # Where each box's bits are in a candidate state's.
+    state_slices = [slice(i, i + dim) for i in range(0, cells * dim, dim)]
+
+    # Candidate states have up to 2 ** dim values for a box, too many to
+    # tabulate beyond 9x9, so those seen most recently are remembered.
+    @lru_cache(maxsize=1 << 16)
+    def _state_code(value):
+        return format(sum(symbol_bit[s] for s in value), '0%db' % dim)
+
+    @lru_cache(maxsize=1 << 16)
+    def _state_value(code):
+        return ''.join(s for s, bit in zip(symbols, code) if bit == '1')
+
+    def _record(data, offset, state):
+        # The record at offset in data, in place.
+        size = sizes[state]
+        view = memoryview(data)[offset:offset + size]
+        if len(view) != size:
+            raise ValueError("Need %d bytes for a record, got %d"
+                             % (size, len(view)))
+        return view
+
+    def record_size(state=False):
+        """The bytes in each encoded grid, or candidate state if state."""
+        return sizes[state]
+
+    def encode_grid(values):
+        """
+        Encode the clues of a Sudoku puzzle.
+
+        Only the boxes with a single value count as clues; the others are
+        taken as empty, whatever their candidates.
+        Input: A sudoku in dictionary form.
+        Output: The encoded grid, as bytes.
+        """
+        grid = ''.join(map(clue_digit.get, map(values.__getitem__, boxes),
+                           repeat(digits[0])))
+        if clue_bits == 5:
+            # Whole groups of 8 digits, cut back to the record.
+            grid += digits[0] * (-len(grid) % 8)
+            return base64.b32decode(grid)[:sizes[False]]
+        number = int(grid, 1 << clue_bits) << grid_pad
+        return number.to_bytes(sizes[False], 'big')
+
+    def decode_grid(data, offset=0):
+        """
+        Decode a grid encoded by encode_grid().
+
+        Input:
+            - data: Any bytes-like object (bytes, bytearray, memoryview,
+              mmap) holding the record, which is read in place.
+            - offset: Where the record starts in data.
+        Output: The sudoku in dictionary form, as grid_values() gives it.
+        """
+        view = _record(data, offset, False)
+        # Any digits past the boxes are padding, and left out by zip().
+        if clue_bits == 5:
+            grid = base64.b32encode(view).decode('ascii')
+        elif clue_bits == 4:
+            grid = view.hex()
+        else:
+            grid = format(int.from_bytes(view, 'big') >> grid_pad,
+                          '0%do' % cells)
+        try:
+            return dict(zip(boxes, map(digit_value.__getitem__, grid)))
+        except KeyError as e:
+            raise ValueError("Not a symbol number: %d"
+                             % digits.index(e.args[0]))
+
+    def encode_state(values):
+        """
+        Encode every box's candidates in a Sudoku puzzle.
+
+        Input: A sudoku in dictionary form.
+        Output: The encoded candidate state, as bytes.
+        """
+        bits = ''.join(map(_state_code, map(values.__getitem__, boxes)))
+        return int(bits.ljust(sizes[True] * 8, '0'), 2).to_bytes(sizes[True],
+                                                                 'big')
+
+    def decode_state(data, offset=0):
+        """
+        Decode a candidate state encoded by encode_state().
+
+        Input: As for decode_grid().
+        Output: The sudoku in dictionary form.
+        """
+        view = _record(data, offset, True)
+        bits = format(int.from_bytes(view, 'big'), '0%db' % (len(view) * 8))
+        return dict(zip(boxes, map(_state_value,
+                                   map(bits.__getitem__, state_slices))))
+
+    def pack(puzzles, state=False):
+        """
+        Encode many puzzles, one after the other, in a single buffer.
+
+        Input:
+            - puzzles: An iterable of sudokus in dictionary form.
+            - state: Whether to encode their candidate states rather than
+              their grids.
+        Output: A bytearray of the records.
+        """
+        encode = encode_state if state else encode_grid
+        return bytearray(b''.join(encode(values) for values in puzzles))
+
+    def records(data, state=False):
+        """
+        Split a buffer from pack() into its records, without copying them.
+
+        Input:
+            - data: Any bytes-like object holding whole records.
+            - state: Whether they're candidate states rather than grids.
+        Output: A list of memoryview slices of data, one for each record.
+        """
+        size = sizes[state]
+        view = memoryview(data)
+        if len(view) % size:
+            raise ValueError("%d bytes isn't a whole number of %d byte "
+                             "records" % (len(view), size))
+        return [view[i:i + size] for i in range(0, len(view), size)]
+
+    def unpack(data, state=False):
+        """
+        Decode the records of a buffer from pack(), in place.
+
+        Input: As for records().
+        Output: A generator of the sudokus in dictionary form.
+        """
+        decode = decode_state if state else decode_grid
+        return (decode(view) for view in records(data, state))
+
+    functions = {}
+    for name, obj in locals().items():
+        if isinstance(obj, fn_type) and not name.startswith('_'):
+            functions[name] = obj
+    return functions
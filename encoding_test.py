@@ -0,0 +1,79 @@
+import random
+import unittest
+import utils
+
+
+class TestEncoding(unittest.TestCase):
+
+    hard = '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..'
+
+    def test_sizes(self):
+        for side, grid_size, state_size in [(2, 6, 8), (3, 41, 92),
+                                            (4, 160, 512), (5, 391, 1954)]:
+            fns = utils.init(side)
+            self.assertEqual(fns['record_size'](), grid_size)
+            self.assertEqual(fns['record_size'](True), state_size)
+
+    def test_round_trip(self):
+        rand = random.Random(25)
+        for side in range(2, 6):
+            fns = utils.init(side)
+            empty = fns['grid_values']('.' * side ** 4)
+            for _ in range(10):
+                grid = dict((box, rand.choice(value) if rand.random() < 0.5
+                             else value) for box, value in empty.items())
+                encoded = fns['encode_grid'](grid)
+                self.assertEqual(len(encoded), fns['record_size']())
+                self.assertEqual(fns['decode_grid'](encoded), grid)
+                state = dict((box, ''.join(sorted(rand.sample(
+                    value, rand.randint(0, len(value))))))
+                    for box, value in empty.items())
+                encoded = fns['encode_state'](state)
+                self.assertEqual(len(encoded), fns['record_size'](True))
+                self.assertEqual(fns['decode_state'](encoded), state)
+
+    def test_layout(self):
+        fns = utils.init(3)
+        values = fns['grid_values'](self.hard)
+        encoded = fns['encode_grid'](values)
+        # A hex digit per box: its symbol number, or 0.
+        self.assertEqual(encoded.hex()[:81], self.hard.replace('.', '0'))
+        # Boxes with candidates, rather than a clue, count as empty.
+        reduced = fns['reduce_puzzle'](values.copy())
+        self.assertEqual(fns['decode_grid'](fns['encode_grid'](reduced)),
+                         fns['grid_values'](fns['values_string'](reduced)))
+        state = fns['encode_state'](reduced)
+        self.assertEqual(fns['decode_state'](state), reduced)
+        # A bit per symbol per box, the first box's clue being 8.
+        self.assertEqual(format(state[0], '08b') + format(state[1], '08b')[0],
+                         '000000010')
+        with self.assertRaises(ValueError):
+            fns['decode_grid'](b'\xf0' + encoded[1:])
+        with self.assertRaises(ValueError):
+            fns['decode_grid'](encoded[:-1])
+
+    def test_pack(self):
+        fns = utils.init(3)
+        values = fns['grid_values'](self.hard)
+        solution = fns['search'](values.copy())
+        for state in (False, True):
+            data = fns['pack']([values, solution, values], state)
+            self.assertEqual(len(data), 3 * fns['record_size'](state))
+            self.assertEqual(list(fns['unpack'](data, state)),
+                             [values, solution, values])
+            # Records are views of the buffer, not copies of it.
+            records = fns['records'](data, state)
+            self.assertIsInstance(records[1], memoryview)
+            self.assertTrue(records[1].obj is data)
+            data[len(data) // 3:2 * len(data) // 3] = data[:len(data) // 3]
+            self.assertEqual(fns['decode_state' if state else 'decode_grid'](
+                records[1]), values)
+            with self.assertRaises(ValueError):
+                fns['records'](data[:-1], state)
+        # Records can be read in place at any offset.
+        data = b'xy' + fns['encode_grid'](values)
+        self.assertEqual(fns['decode_grid'](data, 2), values)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,233 @@
+"""
+Generate Sudoku puzzles with a single solution, of any size utils.init()
+supports, with or without the diagonals as units.
+
+Usage: python generate.py [options] [output]
+
+Each puzzle starts as a random filled grid, from which clues are taken away
+in a random order for as long as the solution stays unique, or until only
+the clues asked for are left. Whether a clue can go is settled by a single
+search, which stops at the first solution it finds: the puzzle without the
+clue has another solution exactly when the puzzle with every other value in
+that box has one. That search is given a budget of nodes, and a clue it
+can't settle within it stays, so the puzzles at 16x16 and up may not be
+minimal, but are still unique, and quick to make. Puzzles are written one per line, with '.' for empty
+boxes; with --workers, they're generated across a pool of processes.
+"""
+import argparse
+import random
+import sys
+import time
+
+import batch
+import parallel
+import utils
+
+# The engine to generate with: the generator does nothing but search.
+engine = 'bitmask'
+
+# The functions from utils.init() for each (side, diagonal) generated for
+# in this process.
+_functions = {}
+
+
+def _fns(side, diagonal):
+    key = (side, diagonal)
+    if key not in _functions:
+        _functions[key] = utils.init(side, diagonal=diagonal, engine=engine)
+    return _functions[key]
+
+
+def _filled(fns, side, rand):
+    # A random filled grid: a row's worth of clues, each put in a random
+    # empty box if propagation allows it, and the search fills in the rest.
+    dim = side * side
+    empty = fns['grid_values']('.' * dim * dim)
+    boxes = list(empty)
+    while True:
+        values = empty.copy()
+        for box in rand.sample(boxes, dim):
+            values[box] = rand.choice(values[box])
+            values = fns['reduce_puzzle'](values)
+            if values is False:
+                break
+        else:
+            values = fns['search'](values)
+            if values:
+                return values
+
+
+class _OutOfNodes(Exception):
+    pass
+
+
+class _Budget(dict):
+    # Search statistics that stop the search, by raising _OutOfNodes, once
+    # it has visited more than limit nodes.
+
+    def __init__(self, limit):
+        dict.__init__(self)
+        self.limit = limit
+
+    def __setitem__(self, key, value):
+        if key == 'nodes' and value > self.limit:
+            raise _OutOfNodes()
+        dict.__setitem__(self, key, value)
+
+
+def _another(fns, trial, budget):
+    # Whether the puzzle trial has a solution; None if the search for one
+    # runs out of budget first.
+    stats = _Budget(budget) if budget is not None else None
+    try:
+        return fns['search'](trial, stats=stats) is not None
+    except _OutOfNodes:
+        return None
+
+
+def _carve(fns, values, clues, budget, rand):
+    # Take clues away from a filled grid, in a random order, while the
+    # solution stays unique, stopping at clues (if given). A clue that
+    # can't go now can't later either, as taking others away only adds
+    # solutions, so each box is tried once. One whose search runs out of
+    # budget is kept, to be safe.
+    symbols = fns['grid_values']('.' * len(values))[next(iter(values))]
+    puzzle = dict(values)
+    left = len(puzzle)
+    for box in rand.sample(list(puzzle), len(puzzle)):
+        if clues is not None and left <= clues:
+            break
+        trial = dict((b, v if len(v) == 1 else symbols)
+                     for b, v in puzzle.items())
+        trial[box] = symbols.replace(values[box], '')
+        if _another(fns, trial, budget) is False:
+            puzzle[box] = symbols
+            left -= 1
+    return puzzle
+
+
+def _generate(fns, side, clues, min_nodes, budget, rand, attempts):
+    # A puzzle as a grid string, searching with fns.
+    for _ in range(attempts):
+        puzzle = _carve(fns, _filled(fns, side, rand), clues, budget, rand)
+        grid = ''.join(v if len(v) == 1 else '.' for v in puzzle.values())
+        if min_nodes is None:
+            return grid
+        stats = {}
+        fns['search'](fns['grid_values'](grid), stats=stats)
+        if stats['nodes'] >= min_nodes:
+            return grid
+    raise RuntimeError("No puzzle meeting the target in %d attempts"
+                       % attempts)
+
+
+def generate(side=3, diagonal=False, clues=None, min_nodes=None, seed=None,
+             attempts=100, budget=100):
+    """
+    Generate a Sudoku puzzle with a single solution.
+
+    Input:
+        - side, diagonal: The puzzle's topology, as for utils.init().
+        - clues: Stop taking clues away once this few are left. None to
+          take away as many as possible; there may be more left either way,
+          where taking any other away would make the solution ambiguous.
+        - min_nodes: The difficulty to aim for, as the least number of
+          nodes the bitmask engine's search needs to solve the puzzle.
+          Puzzles that are easier are thrown away.
+        - seed: Seed for the random numbers, to generate the same puzzle
+          again, or None.
+        - attempts: How many puzzles to try for one hard enough.
+        - budget: The most search nodes to spend on whether a clue can go;
+          if that isn't enough to tell, it stays. None for no limit, which
+          finds minimal puzzles, but can take minutes at 16x16 and up.
+    Output: The puzzle as a grid string, with '.' for empty boxes.
+    """
+    return _generate(_fns(side, diagonal), side, clues, min_nodes, budget,
+                     random.Random(seed), attempts)
+
+
+def _generate_chunk(fns, seeds, side, clues, min_nodes, budget, attempts):
+    return [_generate(fns, side, clues, min_nodes, budget,
+                      random.Random(seed), attempts) for seed in seeds]
+
+
+def generate_many(count, side=3, diagonal=False, clues=None, min_nodes=None,
+                  seed=None, attempts=100, budget=100, workers=0,
+                  chunksize=4):
+    """
+    Generate many Sudoku puzzles, as generate() does one.
+
+    Each puzzle gets its own seed, drawn from seed, so the same seed gives
+    the same puzzles in the same order with any number of workers.
+
+    Input:
+        - count: The number of puzzles.
+        - side, diagonal, clues, min_nodes, seed, attempts, budget: As for
+          generate().
+        - workers: Generate across this many processes, or 0 to generate
+          in this one.
+        - chunksize: Puzzles given to a process at a time.
+    Output: A generator of the puzzles as grid strings.
+    """
+    rand = random.Random(seed)
+    seeds = (rand.getrandbits(64) for _ in range(count))
+    if not workers:
+        fns = _fns(side, diagonal)
+        return (_generate(fns, side, clues, min_nodes, budget,
+                          random.Random(s), attempts) for s in seeds)
+    return parallel.map_chunks(_generate_chunk, seeds, side, diagonal, engine,
+                               workers, chunksize,
+                               args=(side, clues, min_nodes, budget, attempts))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Generate Sudoku puzzles, one per line.')
+    parser.add_argument('output', nargs='?', default='-',
+                        help="file for the puzzles, or '-' for stdout "
+                             "(default)")
+    parser.add_argument('--count', type=int, default=1,
+                        help='puzzles to generate (default 1)')
+    parser.add_argument('--side', type=int, default=3,
+                        help='side of the sub-squares, 2 to 5 (default 3)')
+    parser.add_argument('--diagonal', action='store_true',
+                        help='the main diagonals are units too')
+    parser.add_argument('--clues', type=int,
+                        help='stop taking clues away at this many')
+    parser.add_argument('--min-nodes', type=int,
+                        help='only keep puzzles needing this many search '
+                             'nodes')
+    parser.add_argument('--budget', type=int, default=100,
+                        help='search nodes to spend on each clue (default '
+                             '100); 0 for no limit')
+    parser.add_argument('--seed', type=int,
+                        help='seed for the same puzzles every run')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='generate across this many processes')
+    parser.add_argument('--chunksize', type=int, default=4,
+                        help='puzzles given to a process at a time')
+    args = parser.parse_args(argv)
+
+    outfile = batch.open_output(args.output)
+    start = time.perf_counter()
+    count = 0
+    try:
+        for grid in generate_many(args.count, args.side, args.diagonal,
+                                  args.clues, args.min_nodes, args.seed,
+                                  budget=args.budget or None,
+                                  workers=args.workers,
+                                  chunksize=args.chunksize):
+            outfile.write(grid + '\n')
+            count += 1
+    finally:
+        if args.output == '-':
+            outfile.detach().detach()
+        else:
+            outfile.close()
+    elapsed = time.perf_counter() - start
+    sys.stderr.write('%d puzzles in %.2f seconds: %.1f puzzles/sec\n'
+                     % (count, elapsed, count / elapsed if elapsed else 0))
+
+
+if __name__ == '__main__':
+    main()
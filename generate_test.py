@@ -0,0 +1,51 @@
+import generate
+import unittest
+import utils
+
+
+class TestGenerate(unittest.TestCase):
+
+    def test_unique(self):
+        for side, diagonal in [(2, False), (2, True), (3, False), (3, True)]:
+            fns = utils.init(side, diagonal=diagonal)
+            grid = generate.generate(side, diagonal, seed=side)
+            self.assertEqual(len(grid), side ** 4)
+            self.assertTrue(fns['is_unique'](grid))
+            # Minimal: no clue can go without another solution appearing.
+            for i, c in enumerate(grid):
+                if c != '.':
+                    self.assertFalse(fns['is_unique'](
+                        grid[:i] + '.' + grid[i + 1:]))
+
+    def test_targets(self):
+        fns = utils.init(3)
+        grid = generate.generate(3, clues=40, seed=1)
+        self.assertEqual(sum(1 for c in grid if c != '.'), 40)
+        self.assertTrue(fns['is_unique'](grid))
+
+        grid = generate.generate(3, min_nodes=3, seed=1)
+        stats = {}
+        utils.init(3, engine='bitmask')['search'](fns['grid_values'](grid),
+                                                  stats=stats)
+        self.assertGreaterEqual(stats['nodes'], 3)
+        with self.assertRaises(RuntimeError):
+            generate.generate(2, min_nodes=10 ** 6, seed=1, attempts=2)
+
+    def test_budget(self):
+        # Clues that can't be settled in budget stay, so there may be more
+        # of them, but the solution is still unique.
+        fns = utils.init(4)
+        grid = generate.generate(4, clues=150, seed=2, budget=1)
+        self.assertGreaterEqual(sum(1 for c in grid if c != '.'), 150)
+        self.assertTrue(fns['is_unique'](grid))
+
+    def test_many(self):
+        grids = list(generate.generate_many(6, 3, seed=7))
+        self.assertEqual(len(set(grids)), 6)
+        self.assertEqual(list(generate.generate_many(6, 3, seed=7)), grids)
+        self.assertEqual(list(generate.generate_many(6, 3, seed=7, workers=2,
+                                                     chunksize=2)), grids)
+
+
+if __name__ == '__main__':
+    unittest.main()
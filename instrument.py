@@ -0,0 +1,51 @@
+"""
+Helpers for the optional statistics kept by the engines' search functions.
+
+A search is only instrumented when it's given a stats dict, so that a search
+without one runs exactly the same code as before. The dict gains:
+
+    - nodes: Nodes of the search tree visited.
+    - backtracks: Nodes at which a contradiction was found.
+    - max_depth: The most choices made on any path from the root.
+    - rounds: Rounds of propagation; for the string engine, each run of a
+      strategy by reduce_puzzle().
+    - removed: {strategy name: candidates removed by it}.
+    - time: {phase name: seconds spent in it}. Phases nest, so the time of
+      'reduce_puzzle' includes that of the strategies it calls, and 'search'
+      is the time of the whole search.
+"""
+import time
+
+counters = ('nodes', 'backtracks', 'max_depth', 'rounds')
+
+
+def start(stats):
+    """Add any of the entries above missing from stats."""
+    for key in counters:
+        stats.setdefault(key, 0)
+    stats.setdefault('removed', {})
+    stats.setdefault('time', {})
+
+
+def add(stats, key, name, amount):
+    """Add amount to stats[key][name]."""
+    table = stats[key]
+    table[name] = table.get(name, 0) + amount
+
+
+def wrap(fn, name, stats, size):
+    """
+    Wrap a strategy so that each call adds to stats.
+
+    fn takes a puzzle (and any other arguments) and returns it reduced, or
+    False; size(puzzle) counts the candidates left in a puzzle.
+    """
+    def instrumented(puzzle, *args):
+        before = size(puzzle)
+        start = time.perf_counter()
+        result = fn(puzzle, *args)
+        add(stats, 'time', name, time.perf_counter() - start)
+        if result:
+            add(stats, 'removed', name, before - size(result))
+        return result
+    return instrumented
@@ -0,0 +1,133 @@
+"""
+A compact record of the successive states of a Sudoku puzzle.
+
+Rather than a full copy of the puzzle's dictionary for each frame, a Journal
+keeps the oldest frame it holds, and a (box, old value, new value) delta for
+each box that changed between frames. Any frame can be rebuilt on demand, by
+replaying the deltas onto the nearest earlier keyframe: a full copy kept
+every so many frames, so that rebuilding late frames stays cheap.
+"""
+from collections import deque
+from itertools import islice
+
+
+class Journal(object):
+    """
+    The frames of a Sudoku puzzle's solution, stored as deltas.
+
+    A Journal can be used in place of a list of dictionaries: append() a
+    puzzle's values each time they're worth recording, then take its len(),
+    index it, or iterate over it to get the frames back as dictionaries.
+
+    Input:
+        - keyframe_every: Keep a full copy of every this many frames. None
+          or 0 for no keyframes other than the oldest frame.
+        - max_frames: If given, only the latest this many frames are kept,
+          the oldest being dropped as new ones are appended.
+    """
+
+    def __init__(self, keyframe_every=64, max_frames=None):
+        if max_frames is not None and max_frames < 1:
+            raise ValueError("max_frames must be at least 1")
+        self.keyframe_every = keyframe_every
+        self.max_frames = max_frames
+        self.clear()
+
+    def clear(self):
+        """Forget all the frames, ready to record another puzzle."""
+        # The latest and oldest frames, the deltas between them, and the
+        # index (counting from the first delta ever recorded) of _deltas[0].
+        self._state = None
+        self._base = None
+        self._deltas = deque()
+        self._first = 0
+        # The index of the delta that ends each frame, and the keyframes,
+        # by the same index.
+        self._ends = deque()
+        self._keyframes = {}
+        self._appended = 0
+
+    def append(self, values):
+        """Record values, a sudoku in dictionary form, as the next frame."""
+        if self._state is None:
+            self._state = values.copy()
+            self._base = values.copy()
+        elif values != self._state:
+            state = self._state
+            for box, new in values.items():
+                old = state[box]
+                if old != new:
+                    self._deltas.append((box, old, new))
+                    state[box] = new
+        end = self._first + len(self._deltas)
+        self._ends.append(end)
+
+        self._appended += 1
+        if (self.keyframe_every and self._appended % self.keyframe_every == 0
+                and end not in self._keyframes):
+            self._keyframes[end] = self._state.copy()
+        if self.max_frames and len(self._ends) > self.max_frames:
+            self._drop()
+
+    def _drop(self):
+        # Move the oldest frame forward by one.
+        self._ends.popleft()
+        end = self._ends[0]
+        base = self._keyframes.pop(end, None)
+        if base is not None:
+            self._base = base
+            for _ in range(end - self._first):
+                self._deltas.popleft()
+        else:
+            for _ in range(end - self._first):
+                box, old, new = self._deltas.popleft()
+                self._base[box] = new
+        self._first = end
+
+    def __len__(self):
+        return len(self._ends)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self._ends)
+        if not 0 <= i < len(self._ends):
+            raise IndexError('Journal index out of range')
+        end = self._ends[i]
+        start, values = self._first, self._base
+        for pos, keyframe in self._keyframes.items():
+            if start < pos <= end:
+                start, values = pos, keyframe
+        values = values.copy()
+        for box, old, new in islice(self._deltas, start - self._first,
+                                    end - self._first):
+            values[box] = new
+        return values
+
+    def __iter__(self):
+        values = self._base
+        for changes in self.steps():
+            values = values.copy()
+            for box, old, new in changes:
+                values[box] = new
+            yield values
+
+    def steps(self):
+        """
+        Generate the changes made in each frame, oldest first.
+
+        Each frame's changes are a list of (box, old value, new value)
+        deltas from the frame before; the first frame's are from `base`.
+        Unlike iterating over the Journal, this makes no copies of the
+        puzzle.
+        """
+        deltas = iter(self._deltas)
+        pos = self._first
+        for end in self._ends:
+            yield list(islice(deltas, end - pos))
+            pos = end
+
+    @property
+    def base(self):
+        """A copy of the oldest frame, or None if there are none."""
+        if self._base is not None:
+            return self._base.copy()
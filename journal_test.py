@@ -0,0 +1,68 @@
+import journal
+import solution
+import unittest
+import utils
+
+
+class TestJournal(unittest.TestCase):
+
+    diagonal = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+
+    @classmethod
+    def setUpClass(cls):
+        # Record each frame both as a full copy and in journals.
+        cls.snapshots = []
+        cls.journals = [journal.Journal(), journal.Journal(keyframe_every=7),
+                        journal.Journal(keyframe_every=None)]
+
+        def assign(values, box, value):
+            values[box] = value
+            if len(value) == 1:
+                cls.snapshots.append(values.copy())
+                for record in cls.journals:
+                    record.append(values)
+
+        fns = utils.init(3, diagonal=True, assign_fn=assign)
+        fns['search'](fns['grid_values'](cls.diagonal))
+
+    def test_frames(self):
+        self.assertGreater(len(self.snapshots), 100)
+        for record in self.journals:
+            self.assertEqual(len(record), len(self.snapshots))
+            self.assertEqual(list(record), self.snapshots)
+            for i in [0, 1, 50, len(self.snapshots) - 1, -1]:
+                self.assertEqual(record[i], self.snapshots[i])
+            self.assertRaises(IndexError, record.__getitem__, len(record))
+
+    def test_steps(self):
+        record = self.journals[0]
+        values = record.base
+        self.assertEqual(values, self.snapshots[0])
+        for changes, snapshot in zip(record.steps(), self.snapshots):
+            for box, old, new in changes:
+                self.assertEqual(values[box], old)
+                values[box] = new
+            self.assertEqual(values, snapshot)
+
+    def test_max_frames(self):
+        for keyframe_every in [None, 1, 5]:
+            record = journal.Journal(keyframe_every, max_frames=20)
+            for snapshot in self.snapshots:
+                record.append(snapshot)
+            self.assertEqual(len(record), 20)
+            self.assertEqual(list(record), self.snapshots[-20:])
+            self.assertEqual(record[3], self.snapshots[-17])
+        self.assertRaises(ValueError, journal.Journal, max_frames=0)
+
+    def test_solve(self):
+        from solution_test import TestDiagonalSudoku as diag
+        solution.solve(diag.diagonal_grid)
+        frames = len(solution.assignments)
+        self.assertGreater(frames, 0)
+        self.assertEqual(solution.assignments[-1], diag.solved_diag_sudoku)
+        solution.solve(diag.diagonal_grid)
+        self.assertEqual(len(solution.assignments), frames)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,284 @@
+"""
+Process pool versions of the solver, for putting more than one core to work.
+
+The function closures made by utils.init() can't be pickled, so each worker
+process builds its own set once, when it starts, and only puzzles in
+dictionary form travel between processes.
+"""
+from itertools import islice
+import multiprocessing
+import queue
+
+import utils
+
+# Engines whose reduction functions can be run a node at a time on a
+# dictionary; DLX only searches whole puzzles.
+branching_engines = ('string', 'bitmask')
+
+# How often, in seconds, to check the pool's workers are still alive while
+# waiting for results.
+poll_interval = 1.0
+
+# The worker process' own copy of the functions from utils.init(), and the
+# number of workers the parent process reports as short of work.
+_fns = None
+_hungry = None
+
+
+def _init_worker(side, diagonal, engine, hungry=None):
+    global _fns, _hungry
+    _fns = utils.init(side, diagonal=diagonal, engine=engine)
+    _hungry = hungry
+
+
+def _start_pool(workers, *initargs):
+    """Start a pool of workers, returning it and the set of their pids."""
+    before = set(p.pid for p in multiprocessing.active_children())
+    pool = multiprocessing.Pool(workers, _init_worker, initargs)
+    pids = set(p.pid for p in multiprocessing.active_children()) - before
+    return pool, pids
+
+
+def _next_result(results, pids):
+    """
+    Wait for the next result on the results queue.
+
+    Raises any exception a task raised, or RuntimeError if one of the
+    workers in pids has died.
+    """
+    while True:
+        try:
+            result = results.get(timeout=poll_interval)
+        except queue.Empty:
+            alive = set(p.pid for p in multiprocessing.active_children())
+            if not pids <= alive:
+                # The pool quietly replaces a worker that dies, but the
+                # task it was running is lost, and would never report.
+                raise RuntimeError('A worker process died mid-search')
+            continue
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+
+def _expand(fns, values, box=None):
+    """
+    Reduce a puzzle and branch on the box with the fewest possibilities.
+
+    box is the box whose value was just chosen, if any; engines which can
+    propagate from a single change only do that much work.
+    Returns (solution, children), where children is a list of (values, box)
+    pairs, one for each digit that could go in the chosen box.
+    """
+    if box is not None and 'propagate' in fns:
+        values = fns['propagate'](values, [box])
+    else:
+        values = fns['reduce_puzzle'](values)
+    if not values:
+        return None, []
+
+    choice = fns['choose'](values)
+    if choice is None:
+        return values, []
+
+    box, vals = choice
+    children = []
+    for digit in vals:
+        child = values.copy()
+        child[box] = digit
+        children.append((child, box))
+    return None, children
+
+
+def _search_subtree(stack, budget):
+    """
+    Depth-first search of part of the tree, in a worker process.
+
+    stack holds the (values, box) nodes still to be searched, next last.
+    Every budget nodes the worker checks whether any others are short of
+    work; if so, it gives away the shallower half of its stack, which holds
+    the biggest untried subtrees, and carries on with the rest.
+    Returns ('solved', values), ('exhausted', None) or
+    ('split', [stack, stack]).
+    """
+    nodes = 0
+    while stack:
+        nodes += 1
+        values, box = stack.pop()
+        solution, children = _expand(_fns, values, box)
+        if solution:
+            return 'solved', solution
+        stack.extend(reversed(children))
+
+        if nodes >= budget:
+            nodes = 0
+            if len(stack) > 1 and _hungry is not None and _hungry.value > 0:
+                half = len(stack) // 2
+                return 'split', [stack[:half], stack[half:]]
+    return 'exhausted', None
+
+
+def search(values, side, diagonal=False, engine='string', workers=None,
+           budget=200):
+    """
+    Solve a Sudoku puzzle using a pool of worker processes.
+
+    The search tree is split at its first few choices into at least four
+    subtrees per worker. While there are fewer tasks than workers, busy
+    workers hand half of their remaining subtrees back to be shared out, so
+    idle workers pick up the slack when some subtrees turn out much bigger
+    than others. The first solution found wins, and the rest of the pool is
+    stopped.
+
+    Input:
+        - values: A sudoku in dictionary form.
+        - side, diagonal, engine: As for utils.init(). The engine has to be
+          one of branching_engines.
+        - workers: Number of worker processes; defaults to the CPU count.
+        - budget: Nodes a worker visits between checks for idle workers.
+    Output: The solved sudoku in dictionary form, or None.
+    """
+    if engine not in branching_engines:
+        raise ValueError("Can't search in parallel with the %r engine" % engine)
+    if budget < 1:
+        raise ValueError("budget must be at least 1")
+    workers = workers or multiprocessing.cpu_count()
+    fns = utils.init(side, diagonal=diagonal, engine=engine)
+
+    frontier = [(values.copy(), None)]
+    while frontier and len(frontier) < 4 * workers:
+        solution, children = _expand(fns, *frontier.pop(0))
+        if solution:
+            return solution
+        frontier.extend(children)
+    if not frontier:
+        return
+
+    results = queue.Queue()
+    hungry = multiprocessing.Value('i', 0, lock=False)
+    pool, pids = _start_pool(workers, side, diagonal, engine, hungry)
+    try:
+        def submit(stack):
+            pool.apply_async(_search_subtree, (stack, budget),
+                             callback=results.put,
+                             error_callback=results.put)
+
+        for node in frontier:
+            submit([node])
+        pending = len(frontier)
+        while pending:
+            hungry.value = max(0, workers - pending)
+            outcome, payload = _next_result(results, pids)
+            pending -= 1
+            if outcome == 'solved':
+                return payload
+            if outcome == 'split':
+                for stack in payload:
+                    submit(stack)
+                pending += len(payload)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _solve_chunk(fns, grids, wildcard):
+    return [fns['search'](fns['grid_values'](grid, wildcard)) for grid in grids]
+
+
+def _run_chunk(task, start, chunk, args):
+    return start, task(_fns, chunk, *args)
+
+
+def solve_many(grids, side=3, diagonal=False, engine='string', workers=None,
+               chunksize=64, ordered=True, wildcard='.'):
+    """
+    Solve a stream of Sudoku puzzles using a pool of worker processes.
+
+    Each worker builds the solving functions once, then solves the grids it
+    is sent chunksize at a time. Only a few chunks per worker are read
+    ahead of the results, so grids can be a generator over far more puzzles
+    than would fit in memory.
+
+    Input:
+        - grids: An iterable of puzzles in string form.
+        - side, diagonal, engine: As for utils.init().
+        - workers: Number of worker processes; defaults to the CPU count.
+        - chunksize: Number of grids sent to a worker at a time.
+        - ordered: Whether to return the solutions in the order of grids,
+          rather than as soon as they are found.
+        - wildcard: The character standing for an empty box in grids.
+    Output: A generator of solved sudokus in dictionary form, or None for
+            each puzzle with no solution. If ordered is false, it generates
+            (index in grids, solution) pairs instead.
+    """
+    return map_chunks(_solve_chunk, grids, side, diagonal, engine, workers,
+                      chunksize, ordered, (wildcard,))
+
+
+def map_chunks(task, items, side=3, diagonal=False, engine='string',
+               workers=None, chunksize=64, ordered=True, args=()):
+    """
+    Run a task over a stream of items using a pool of worker processes.
+
+    The machinery of solve_many(), for other work on puzzles: each worker
+    builds the functions from utils.init() once, and is sent the items
+    chunksize at a time, a few chunks per worker ahead of the results.
+
+    Input:
+        - task: A function, which must be picklable (defined at the top
+          level of a module), called in the worker as task(functions, chunk,
+          *args), and returning a list of the results for the chunk's items.
+        - items: An iterable of the items, which must be picklable.
+        - side, diagonal, engine: As for utils.init().
+        - workers, chunksize, ordered: As for solve_many().
+        - args: Further arguments for task.
+    Output: A generator of the results, or of (index in items, result)
+            pairs if ordered is false.
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+    workers = workers or multiprocessing.cpu_count()
+    return _map_chunks(task, iter(items), (side, diagonal, engine), workers,
+                       chunksize, ordered, args)
+
+
+def _map_chunks(task, items, initargs, workers, chunksize, ordered, args):
+    results = queue.Queue()
+    pool, pids = _start_pool(workers, *initargs)
+    try:
+        # Chunks sent but not yet passed on to the caller, and those
+        # which have come back out of order, keyed by their first index.
+        pending = 0
+        finished = {}
+        start = done = 0
+        more = True
+        while True:
+            while more and pending < 2 * workers:
+                chunk = list(islice(items, chunksize))
+                if not chunk:
+                    more = False
+                    break
+                pool.apply_async(_run_chunk, (task, start, chunk, args),
+                                 callback=results.put,
+                                 error_callback=results.put)
+                start += len(chunk)
+                pending += 1
+            if not pending:
+                return
+
+            first, chunk_results = _next_result(results, pids)
+            if not ordered:
+                pending -= 1
+                for i, result in enumerate(chunk_results, first):
+                    yield i, result
+                continue
+            finished[first] = chunk_results
+            while done in finished:
+                chunk_results = finished.pop(done)
+                pending -= 1
+                done += len(chunk_results)
+                for result in chunk_results:
+                    yield result
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,88 @@
+import parallel
+import solution
+import unittest
+import utils
+
+
+class TestParallelSearch(unittest.TestCase):
+
+    hard = '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..'
+
+    def test_search(self):
+        fns = utils.init(3)
+        answer = fns['search'](fns['grid_values'](self.hard))
+        for engine in parallel.branching_engines:
+            values = parallel.search(fns['grid_values'](self.hard), 3,
+                                     engine=engine, workers=2, budget=5)
+            self.assertEqual(values, answer)
+
+    def test_bad_arguments(self):
+        values = utils.init(2)['grid_values']('.' * 16)
+        self.assertRaises(ValueError, parallel.search, values, 2, engine='dlx')
+        self.assertRaises(ValueError, parallel.search, values, 2, budget=0)
+
+    def test_no_solution(self):
+        fns = utils.init(3)
+        values = fns['grid_values'](self.hard)
+        values['A2'] = '8'
+        self.assertIsNone(parallel.search(values, 3, workers=2))
+
+        # A given which doesn't clash, but leaves no way to finish the puzzle.
+        values = fns['grid_values']('82' + self.hard[2:])
+        self.assertTrue(fns['reduce_puzzle'](values.copy()))
+        self.assertIsNone(parallel.search(values, 3, workers=2, budget=1))
+
+    def test_input_untouched(self):
+        fns = utils.init(3)
+        values = fns['grid_values'](self.hard)
+        before = values.copy()
+        parallel.search(values, 3, workers=2)
+        self.assertEqual(values, before)
+
+    def test_solve(self):
+        from solution_test import TestDiagonalSudoku as diag
+        self.assertEqual(solution.solve(diag.diagonal_grid, workers=2),
+                         diag.solved_diag_sudoku)
+
+
+class TestSolveMany(unittest.TestCase):
+
+    easy = '..3.2.6..9..3.5..1..18.64....81.29..7.......8..67.82....26.95..8..2.3..9..5.1.3..'
+
+    def setUp(self):
+        self.fns = utils.init(3)
+        bad = TestParallelSearch.hard[:1] + '8' + TestParallelSearch.hard[2:]
+        self.grids = [self.easy, TestParallelSearch.hard, bad] * 5
+        self.answers = [self.fns['search'](self.fns['grid_values'](grid))
+                        for grid in self.grids]
+
+    def test_ordered(self):
+        for engine in utils.engines:
+            solutions = parallel.solve_many(iter(self.grids), 3, engine=engine,
+                                            workers=2, chunksize=2)
+            self.assertEqual(list(solutions), self.answers)
+
+    def test_unordered(self):
+        solutions = parallel.solve_many(self.grids, 3, workers=2, chunksize=1,
+                                        ordered=False)
+        solutions = sorted(solutions, key=lambda pair: pair[0])
+        self.assertEqual(solutions, list(enumerate(self.answers)))
+
+    def test_stop_early(self):
+        solutions = parallel.solve_many(self.grids, 3, workers=2, chunksize=1)
+        self.assertEqual(next(solutions), self.answers[0])
+        solutions.close()
+
+    def test_bad_arguments(self):
+        self.assertRaises(ValueError, parallel.solve_many, self.grids, 3,
+                          chunksize=0)
+        self.assertEqual(list(parallel.solve_many([], 3, workers=2)), [])
+
+    def test_solve_many(self):
+        from solution_test import TestDiagonalSudoku as diag
+        solutions = solution.solve_many([diag.diagonal_grid] * 3, workers=2)
+        self.assertEqual(list(solutions), [diag.solved_diag_sudoku] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Rate how hard Sudoku puzzles are, from a single instrumented solve.
+
+Usage: python rating.py [options] [input [output]]
+
+A puzzle is solved once, by the string engine with every reduction strategy
+in utils.strategy_names, and the statistics its search keeps (see the
+instrument module) make up the rating. As reduce_puzzle() only runs a
+strategy once all the cheaper ones have stalled, any strategy that removed
+candidates, before the search guessed or after, was needed where it ran.
+The score is the weight of the hardest of those, plus, if the search had to
+guess, a weight for searching at all and the log of the nodes it took, so a
+puzzle solved by logic alone always scores below one that needs guessing.
+
+From the command line, puzzles are read one per line as batch.py reads them,
+and each is written back with its score in front, separated by a tab.
+"""
+import argparse
+import math
+
+import batch
+import utils
+
+# How hard each strategy is to apply, in the order reduce_puzzle() tries
+# them; the score for a puzzle that needs searching starts above them all.
+weights = dict((name, i) for i, name in enumerate(utils.strategy_names))
+search_weight = len(weights)
+
+# The functions from utils.init() for each (side, diagonal, wildcard) rated
+# in this process.
+_functions = {}
+
+
+def _fns(side, diagonal, wildcard):
+    key = (side, diagonal, wildcard)
+    if key not in _functions:
+        _functions[key] = utils.init(side, wildcard, diagonal,
+                                     strategies=utils.strategy_names)
+    return _functions[key]
+
+
+def rate(grid, side=3, diagonal=False, wildcard='.'):
+    """
+    Rate how hard a Sudoku puzzle is.
+
+    Input:
+        - grid: The puzzle in string form.
+        - side, diagonal, wildcard: As for utils.init().
+    Output: A dictionary of:
+        - score: The difficulty, higher for harder puzzles.
+        - solved: Whether the puzzle has a solution.
+        - strategies: {name: candidates removed} for each strategy needed,
+          easiest first.
+        - nodes, backtracks, max_depth: The nodes the search visited, the
+          contradictions it met, and the most guesses made at once.
+    """
+    fns = _fns(side, diagonal, wildcard)
+    stats = {}
+    solved = fns['search'](fns['grid_values'](grid), stats=stats) is not None
+    needed = [name for name in utils.strategy_names
+              if stats['removed'].get(name)]
+    score = float(max([weights[name] for name in needed] or [0]))
+    if stats['nodes'] > 1:
+        score += search_weight + math.log2(stats['nodes'])
+    return {'score': score, 'solved': solved,
+            'strategies': dict((name, stats['removed'][name])
+                               for name in needed),
+            'nodes': stats['nodes'], 'backtracks': stats['backtracks'],
+            'max_depth': stats['max_depth']}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Rate Sudoku puzzles, one per line.')
+    parser.add_argument('input', nargs='?', default='-',
+                        help="file of puzzles, or '-' for stdin (default)")
+    parser.add_argument('output', nargs='?', default='-',
+                        help="file for the rated puzzles, or '-' for stdout "
+                             "(default)")
+    parser.add_argument('--side', type=int, default=3,
+                        help='side of the sub-squares, 2 to 5 (default 3)')
+    parser.add_argument('--diagonal', action='store_true',
+                        help='the main diagonals are units too')
+    parser.add_argument('--wildcard', default='.',
+                        help="character for an empty box (default '.')")
+    args = parser.parse_args(argv)
+
+    infile = batch.open_input(args.input)
+    outfile = batch.open_output(args.output)
+    try:
+        for grid in batch.read_grids(infile):
+            rating = rate(grid, args.side, args.diagonal, args.wildcard)
+            outfile.write('%.2f\t%s\n' % (rating['score'], grid))
+    finally:
+        # Leave stdin and stdout open for the caller.
+        if args.output == '-':
+            outfile.detach().detach()
+        else:
+            outfile.close()
+        if args.input == '-':
+            infile.detach()
+        else:
+            infile.close()
+
+
+if __name__ == '__main__':
+    main()
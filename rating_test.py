@@ -0,0 +1,67 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import rating
+
+
+class TestRating(unittest.TestCase):
+
+    easy = '..3.2.6..9..3.5..1..18.64....81.29..7.......8..67.82....26.95..8..2.3..9..5.1.3..'
+    medium = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+    hard = '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..'
+
+    def test_rate(self):
+        easy = rating.rate(self.easy)
+        self.assertEqual(easy['strategies'].keys(), set(['eliminate']))
+        self.assertEqual((easy['nodes'], easy['backtracks'],
+                          easy['max_depth']), (1, 0, 0))
+
+        medium = rating.rate(self.medium)
+        self.assertIn('naked_siblings', medium['strategies'])
+        self.assertEqual(medium['nodes'], 1)
+
+        hard = rating.rate(self.hard)
+        self.assertTrue(hard['solved'])
+        self.assertGreater(hard['nodes'], 1)
+        self.assertGreater(hard['backtracks'], 0)
+        self.assertGreater(hard['max_depth'], 0)
+        # The strategies come easiest first.
+        self.assertEqual(list(hard['strategies']),
+                         sorted(hard['strategies'], key=rating.weights.get))
+        self.assertLess(easy['score'], medium['score'])
+        self.assertLess(medium['score'], hard['score'])
+        # Any guessing rates above any amount of logic.
+        self.assertGreater(hard['score'], max(rating.weights.values()))
+
+    def test_unsolvable(self):
+        self.assertFalse(rating.rate('88' + '.' * 79)['solved'])
+
+    def test_sizes(self):
+        result = rating.rate('3..2..1..2..4..1', side=2)
+        self.assertTrue(result['solved'])
+        result = rating.rate('2.............62....1....7...6..8...3...9...7...6..4'
+                             '...4....8....52.............3', diagonal=True)
+        self.assertTrue(result['solved'])
+
+    def test_main(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'puzzles.txt')
+            with open(path, 'w') as f:
+                f.write('# puzzles\n%s\n\n%s\n' % (self.easy, self.hard))
+            output = os.path.join(directory, 'rated.txt')
+            rating.main([path, output])
+            with io.open(output) as f:
+                lines = [line.rstrip('\n').split('\t') for line in f]
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual([grid for score, grid in lines],
+                         [self.easy, self.hard])
+        self.assertEqual(float(lines[0][0]), rating.rate(self.easy)['score'])
+
+
+if __name__ == '__main__':
+    unittest.main()
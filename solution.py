@@ -1,6 +1,9 @@
+import journal
+import parallel
 import utils
 
-assignments = []
+# The frames of the latest solve, for visualize_assignments().
+assignments = journal.Journal()
 
 def assign_value(values, box, value):
     """
@@ -9,11 +12,11 @@ def assign_value(values, box, value):
     """
     values[box] = value
     if len(value) == 1:
-        assignments.append(values.copy())
+        assignments.append(values)
     return values
 
 
-def solve(grid):
+def solve(grid, workers=None):
     """
     Find the solution to a Sudoku grid.
     Args:
@@ -22,17 +25,43 @@ def solve(grid):
                 ('2.............62....1....7.'
                  '..6..8...3...9...7...6..4..'
                  '.4....8....52.............3')
+        workers(int): if given, search in parallel across this many
+            processes (see parallel.search). The steps taken by the worker
+            processes aren't recorded in `assignments`.
     Returns:
         The dictionary representation of the final sudoku grid. False if no
-        solution exists.
+        solution exists. `assignments` is cleared first, so afterwards it
+        only holds the frames of this solve.
     """
+    assignments.clear()
+    if workers:
+        return parallel.search(grid_values(grid), 3, diagonal=True,
+                               workers=workers)
     values = search(grid_values(grid))
     return values
 
 
+def solve_many(grids, workers=None, chunksize=64, ordered=True):
+    """
+    Find the solutions to many Sudoku grids, across a pool of processes.
+    Args:
+        grids: an iterable of strings, each representing a sudoku grid.
+        workers(int): the number of processes; defaults to the CPU count.
+        chunksize(int): the number of grids sent to a process at a time.
+        ordered(bool): if false, generate (index, solution) pairs as soon
+            as each is found, instead of solutions in the order of grids.
+    Returns:
+        A generator of the dictionary representations of the final sudoku
+        grids; None for each grid with no solution. The steps taken aren't
+        recorded in `assignments`.
+    """
+    return parallel.solve_many(grids, 3, diagonal=True, workers=workers,
+                               chunksize=chunksize, ordered=ordered)
+
+
 __fn_dict = utils.init(3, diagonal=True, assign_fn=assign_value)
 globals().update(__fn_dict)
-__all__ = list(__fn_dict.keys()) + ['solve', 'assign_value']
+__all__ = list(__fn_dict.keys()) + ['solve', 'solve_many', 'assign_value']
 
 
 if __name__ == '__main__':
@@ -2,17 +2,42 @@ import os
 import re
 import sys
 import string
+import time
+from itertools import combinations, islice
+
+import bitmask
+import canonical
+import dlx
+import encoding
+from buckets import Buckets
+import instrument
+
+try:
+    import vectorized
+except ImportError:
+    # NumPy isn't installed, so there are no batch functions.
+    vectorized = None
 
 ws = '\n\r\t |+-'
 re_ws = re.compile(r"""(\n|\r|\t| |\||\+|-)""")
 
 fn_type = type(lambda x:0)
 
+engines = ('string', 'bitmask', 'dlx')
+
+# The reduction strategies reduce() can run, roughly cheapest first, and
+# those it runs by default.
+strategy_names = ('eliminate', 'only_choice', 'naked_siblings',
+                  'pointing_pairs', 'box_line', 'hidden_subsets', 'x_wing',
+                  'swordfish')
+default_strategies = ('naked_siblings', 'only_choice', 'eliminate')
+
 def cross(a, b):
     return [s+t for s in a for t in b]
 
 
-def init(side, wildcard='.', diagonal=False, assign_fn=None):
+def init(side, wildcard='.', diagonal=False, assign_fn=None, engine='string',
+         strategies=None, order=None, budgets=None, lcv=False):
     """
     Creates functions used to solve Sudoku puzzles of varying sizes.
 
@@ -41,13 +66,70 @@ def init(side, wildcard='.', diagonal=False, assign_fn=None):
         - assign_fn:
             Function with signature (dictionary, key, value) used to assign
             the given value to the dictionary under the specified key. Used by
-            the visualisation module.
+            the visualisation module. Only supported by the 'string' engine.
+        - engine:
+            How the candidates of each cell are represented while solving.
+            'string' (the default) works directly on the dictionary of
+            symbol strings; 'bitmask' holds each cell's candidates as an
+            integer, converting to and from the dictionary form at the
+            boundaries of each function; 'dlx' searches with Dancing Links
+            (the reduction functions are the string engine's). All engines
+            take and return the same dictionaries.
+        - strategies:
+            The names of the reduction strategies reduce() runs, in order,
+            from `strategy_names`. Defaults to `default_strategies`; the
+            others cost more per round, but leave hard puzzles less to
+            search. Not supported by the 'bitmask' engine, which propagates
+            in its own way.
+        - order:
+            The order reduce_puzzle() escalates through the strategies in,
+            cheapest first. By default, that of `strategy_names`. If
+            'learned', it's learned as they run, from how many candidates
+            each removes per second; see strategy_profile(). The result is
+            the same whatever the order, but not the time it takes, nor
+            which strategy gets the credit for each removal.
+        - budgets:
+            Dictionary of {strategy name: the most times reduce_puzzle() may
+            run it}. Strategies not in it are unlimited. Budgets cap the
+            time spent on a propagation, at the risk of stopping short of
+            what the strategies could have removed between them.
+        - lcv:
+            Whether the search tries the candidates of the box it branches
+            on least constraining first: those that appear in the fewest of
+            its unsolved peers. Not supported by the 'dlx' engine.
     Output:
-        A dictionary of all the function closures produced by this function.
+        A dictionary of all the function closures produced by this function,
+        and those of the canonical and encoding modules for the topology. If NumPy is
+        installed, it includes the batch functions from the
+        vectorized module.
     """
 
     if not (2 <= side <= 5):
         raise ValueError("Sorry, can't solve Sudoku puzzles of that size.")
+    if engine not in engines:
+        raise ValueError("Unknown engine %r; choose from %s" % (engine, engines))
+    if assign_fn is not None and engine != 'string':
+        raise ValueError("assign_fn is only supported by the 'string' engine")
+    if lcv and engine == 'dlx':
+        raise ValueError("lcv isn't supported by the 'dlx' engine")
+    if strategies is None:
+        strategies = default_strategies
+    elif engine == 'bitmask':
+        raise ValueError("strategies aren't supported by the 'bitmask' engine")
+    for name in strategies:
+        if name not in strategy_names:
+            raise ValueError("Unknown strategy %r; choose from %s"
+                             % (name, strategy_names))
+    if engine == 'bitmask' and (order is not None or budgets):
+        raise ValueError("order and budgets aren't supported by the 'bitmask' "
+                         "engine")
+    if order is None:
+        order = sorted(strategies, key=strategy_names.index)
+    elif order != 'learned' and sorted(order) != sorted(strategies):
+        raise ValueError("order must list each of the strategies once")
+    for name in budgets or []:
+        if name not in strategies:
+            raise ValueError("Budget for unused strategy %r" % name)
 
     dim = side * side
     length = dim * dim
@@ -93,8 +175,24 @@ def init(side, wildcard='.', diagonal=False, assign_fn=None):
     peer_tups = [(s, sorted(set(_flatten(units[s])) - set([s]))) for s in boxes]
     peers = dict(((s, set(peers)) for s, peers in peer_tups))
 
+    # Each square unit paired with each other unit it shares more than one
+    # box with, for the strategies that look at where they intersect:
+    # (square, line, boxes in both).
+    intersections = []
+    for square in square_units:
+        for line in unitlist:
+            common = set(square) & set(line)
+            if line is not square and len(common) > 1:
+                intersections.append((square, line, common))
+
     symbols = ''.join(sorted(set(symbols)))
 
+    # The boxes in name order, numbered for the search's Buckets, which
+    # break ties by number and so by name.
+    box_order = sorted(boxes)
+    box_ids = dict((box, i) for i, box in enumerate(box_order))
+    peer_ids = [sorted(box_ids[p] for p in peers[box]) for box in box_order]
+
     if 0:
         val_list = [('rows', row_units),
                     ('cols', col_units),
@@ -109,12 +207,22 @@ def init(side, wildcard='.', diagonal=False, assign_fn=None):
             for line in seq:
                 print(line)
 
+    symbol_bit = dict((s, 1 << i) for i, s in enumerate(symbols))
+
+    # The contents of each unit when naked_siblings() last found nothing in
+    # it, keyed by (unit, num_siblings), so unchanged units are skipped.
+    _settled = {}
+
     if assign_fn is None:
         def assign_fn(values, box, value):
             values[box] = value
     else:
         assert isinstance(assign_fn, fn_type)
 
+    def _undo(values, trail, mark):
+        while len(trail) > mark:
+            box, value = trail.pop()
+            values[box] = value
 
     def values_grid(values):
         """
@@ -189,183 +297,567 @@ def init(side, wildcard='.', diagonal=False, assign_fn=None):
         return dict(zip(boxes, puzzle))
     grid_values.__doc__ %= locals()
 
+    def values_string(values, wildcard=wildcard):
+        """
+        Convert the dict of Sudoku values back into a grid in string form.
+
+        Boxes with more than one possible value are written as the wildcard.
+        """
+        return ''.join(values[box] if len(values[box]) == 1 else wildcard
+                       for box in boxes)
+
+    # For each strategy: [times run by reduce_puzzle(), candidates removed,
+    # seconds taken], which reduce_puzzle() learns its order from.
+    _profile = dict((name, [0, 0, 0.]) for name in strategies)
+
+    def _ranking():
+        if order != 'learned':
+            return list(order)
+        run = [name for name in strategies if _profile[name][0]]
+        rate = lambda name: _profile[name][1] / (_profile[name][2] or 1e-9)
+        run.sort(key=rate, reverse=True)
+        return run + [name for name in strategies if not _profile[name][0]]
+
+    def _tally(values):
+        # The number of candidates left, and whether any box has none.
+        lengths = [len(value) for value in values.values()]
+        return sum(lengths), 0 in lengths
+
+    def strategy_profile():
+        """
+        Report what reduce_puzzle() has learned about each strategy.
+
+        Output: A dictionary of {strategy name: {'runs': times run,
+                'removed': candidates removed, 'seconds': time taken}}, in
+                the order reduce_puzzle() will next try them.
+        """
+        return dict((name, dict(zip(('runs', 'removed', 'seconds'),
+                                    _profile[name])))
+                    for name in _ranking())
+
     def _boxes_with_val_len(values, length):
         boxes = [(box, val) for box, val in values.items()
                  if len(val) == length]
         return boxes
 
-    def eliminate(values):
-        """
-        Go through all the boxes, and whenever there is a box with a value,
-        eliminate this value from the values of all its peers.
-        Input: A sudoku in dictionary form.
-        Output: The resulting sudoku in dictionary form.
-        """
-        solved = _boxes_with_val_len(values, 1)
-        for box, digit in solved:
-            for peer in peers[box]:
-                assign_fn(values, peer, values[peer].replace(digit, ''))
-        return values
+    def _candidates(values):
+        return sum(len(value) for value in values.values())
+
+    def _reducers(assign, stats=None):
+        # The reduction functions, with every change to a box made through
+        # assign(values, box, value). If a stats dict is given, they add
+        # what they do to it; see the instrument module.
+
+        def eliminate(values, boxes=None):
+            """
+            Go through all the boxes, and whenever there is a box with a value,
+            eliminate this value from the values of all its peers.
+            Input:
+                - values: A sudoku in dictionary form.
+                - boxes: Only go through these boxes, if given.
+            Output: The resulting sudoku in dictionary form.
+            """
+            if boxes is None:
+                solved = _boxes_with_val_len(values, 1)
+            else:
+                solved = [(box, values[box]) for box in boxes
+                          if len(values[box]) == 1]
+            for box, digit in solved:
+                for peer in peers[box]:
+                    if digit in values[peer]:
+                        assign(values, peer, values[peer].replace(digit, ''))
+            return values
+
+        def only_choice(values):
+            """
+            Go through all the units, and whenever there is a unit with a value that
+            only fits in one box, assign the value to this box.
+            Input: A sudoku in dictionary form.
+            Output: The resulting sudoku in dictionary form.
+            """
+            singles = []
+            for unit in unitlist:
+                all_vals = set(''.join([values[box] for box in unit]))
+                for digit in all_vals:
+                    locations = [box for box in unit if digit in values[box]]
+                    if len(locations) == 1:
+                        singles.append((digit, locations[0]))
+            for digit, box in set(singles):
+                assign(values, box, digit)
+            return values
+
+        def naked_siblings(values, num_siblings=None):
+            """Generalisation of the naked twins strategy.
+
+            If a unit contains n cells with only n options between them,
+            eliminate those options from all the other cells in that unit.
+            The cells needn't be identical: {12}, {23} and {13} will do.
+            Units whose cells haven't changed since they were last found to
+            have no such subsets are skipped."""
+            if num_siblings is not None:
+                assert 2 <= num_siblings <= (dim-1)
+
+            for u, unit in enumerate(unitlist):
+                key = (u, num_siblings)
+                contents = [values[box] for box in unit]
+                if _settled.get(key) == contents:
+                    continue
+                masks = [sum(symbol_bit[d] for d in value)
+                         for value in contents]
+                removals = bitmask.naked_removals(masks, num_siblings)
+                if removals is None:
+                    # The unit can't be completed: there are fewer symbols
+                    # left than cells to fill. Empty a box to say so.
+                    box = min(unit, key=lambda box: len(values[box]) < 2)
+                    assign(values, box, '')
+                    continue
+                for pos, mask in removals.items():
+                    assign(values, unit[pos], ''.join(
+                        d for d in contents[pos] if not symbol_bit[d] & mask))
+                if not removals:
+                    _settled[key] = contents
+
+            return values
 
-    def only_choice(values):
+        def naked_twins(values):
+            """Eliminate values using the naked twins strategy.
+
+            'Naked twins' are two cells in a unit which both contain the same two
+            values. These two values can't appear in any other cells, so remove
+            them from all other cells.
+
+            Here's an example: If two cells each contain the two options 2 and 3 -
+            one of those cells must contain the 2, and the other the 3; no other
+            cell in that unit can. Therefore we can eliminate those values from the
+            other cells!
+
+            Args:
+                values:
+                    The dictionary representation of a Sudoku puzzle
+                    ({'box-co-ords': symbol-string, ...}
+
+            Returns:
+                the values dictionary with the naked twins eliminated from peers.
+            """
+
+            # Find all instances of naked twins
+            # Eliminate the naked twins as possibilities for their peers
+            return naked_siblings(values, 2)
+
+        def hidden_subsets(values, size=None):
+            """Generalisation of only_choice() to hidden pairs, triples, etc.
+
+            If n symbols can only go in the same n cells of a unit, those
+            cells can't hold anything else, so remove their other options.
+            Input:
+                - values: A sudoku in dictionary form.
+                - size: The size of subset to look for. By default, pairs
+                  and triples.
+            Output: The resulting sudoku in dictionary form.
+            """
+            if size is None:
+                sizes = [n for n in (2, 3) if n < dim]
+            else:
+                assert 2 <= size <= (dim-1)
+                sizes = [size]
+
+            for unit in unitlist:
+                places = {}
+                for box in unit:
+                    for digit in values[box]:
+                        places.setdefault(digit, []).append(box)
+                for n in sizes:
+                    candidates = sorted(d for d, boxes in places.items()
+                                        if 2 <= len(boxes) <= n)
+                    for digits in combinations(candidates, n):
+                        boxes = set()
+                        for digit in digits:
+                            boxes.update(places[digit])
+                        if len(boxes) != n:
+                            continue
+                        for box in boxes:
+                            value = ''.join(d for d in values[box]
+                                            if d in digits)
+                            if value != values[box]:
+                                assign(values, box, value)
+            return values
+
+        def _confined(values, base, target, common):
+            # Remove from the rest of target any symbol which, within base,
+            # can only go in the boxes common to both.
+            inside = set(''.join(values[box] for box in common))
+            outside = ''.join(values[box] for box in base if box not in common)
+            for digit in inside.difference(outside):
+                for box in target:
+                    if box not in common and digit in values[box]:
+                        assign(values, box, values[box].replace(digit, ''))
+            return values
+
+        def pointing_pairs(values):
+            """
+            If the options for a symbol in a square unit all lie in one row,
+            column or diagonal, eliminate it from the rest of that line.
+            Input: A sudoku in dictionary form.
+            Output: The resulting sudoku in dictionary form.
+            """
+            for square, line, common in intersections:
+                _confined(values, square, line, common)
+            return values
+
+        def box_line(values):
+            """
+            If the options for a symbol in a row, column or diagonal all lie
+            in one square unit, eliminate it from the rest of that square.
+            Input: A sudoku in dictionary form.
+            Output: The resulting sudoku in dictionary form.
+            """
+            for square, line, common in intersections:
+                _confined(values, line, square, common)
+            return values
+
+        def fish(values, size):
+            """Generalisation of the X-Wing and Swordfish strategies.
+
+            If the options for a symbol in n rows all lie in the same n
+            columns, it must appear once in each of those columns within the
+            n rows, so eliminate it from the rest of the columns; and the
+            same with rows and columns swapped.
+            """
+            assert 2 <= size <= (dim-1)
+            for bases, covers in ((row_units, col_units),
+                                  (col_units, row_units)):
+                for digit in symbols:
+                    lines = []
+                    for base in bases:
+                        places = [j for j, box in enumerate(base)
+                                  if digit in values[box]]
+                        if 2 <= len(places) <= size:
+                            lines.append((base, places))
+                    for fins in combinations(lines, size):
+                        places = set()
+                        for base, line_places in fins:
+                            places.update(line_places)
+                        if len(places) != size:
+                            continue
+                        used = set()
+                        for base, line_places in fins:
+                            used.update(base)
+                        for j in places:
+                            for box in covers[j]:
+                                if box not in used and digit in values[box]:
+                                    assign(values, box,
+                                           values[box].replace(digit, ''))
+            return values
+
+        def x_wing(values):
+            """Eliminate values using the X-Wing strategy; see fish()."""
+            return fish(values, 2)
+
+        def swordfish(values):
+            """Eliminate values using the Swordfish strategy; see fish()."""
+            return fish(values, 3)
+
+        def reduce(values):
+            """One round of each of the reduction strategies, in order."""
+            for strategy in pipeline:
+                values = strategy(values)
+            return values
+
+        def reduce_puzzle(values):
+            """
+            Run the strategies until none of them can remove any more.
+
+            The strategies are escalated through, cheapest first: each is
+            only run once all those before it have stalled, and as soon as
+            one removes anything, it's back to the first. With a 'learned'
+            order, they're ranked by the candidates they've removed per
+            second so far, and any not yet run go last. A strategy whose
+            budget has run out is skipped.
+            If at some point there's a box with no available values, return
+            False.
+            Input: A sudoku in dictionary form.
+            Output: The resulting sudoku in dictionary form.
+            """
+            ranked = _ranking()
+            runs = dict.fromkeys(ranked, 0)
+            size, empty = _tally(values)
+            # eliminate() only needs to go through the boxes solved since it
+            # last ran.
+            eliminated = set()
+            i = 0
+            while i < len(ranked):
+                name = ranked[i]
+                if budgets and runs[name] >= budgets.get(name, runs[name] + 1):
+                    i += 1
+                    continue
+                runs[name] += 1
+                if stats is not None:
+                    stats['rounds'] += 1
+                start = time.perf_counter()
+                if name == 'eliminate':
+                    solved = set(box for box, value in values.items()
+                                 if len(value) == 1)
+                    values = named[name](values, solved - eliminated)
+                    eliminated = solved
+                else:
+                    values = named[name](values)
+                elapsed = time.perf_counter() - start
+                after, empty = _tally(values)
+
+                profile = _profile[name]
+                profile[0] += 1
+                profile[1] += size - after
+                profile[2] += elapsed
+                if empty:
+                    return False
+                i = 0 if after < size else i + 1
+                size = after
+            return values
+
+        named = dict((name, fn) for name, fn in locals().items()
+                     if name in strategy_names)
+        if stats is not None:
+            # Each strategy reports its cost (time) and yield (candidates
+            # removed). naked_twins() looks naked_siblings up when it's
+            # called, so it'll get the instrumented version too.
+            for name in strategies:
+                named[name] = instrument.wrap(named[name], name, stats,
+                                              _candidates)
+            naked_siblings = instrument.wrap(naked_siblings, 'naked_siblings',
+                                             stats, _candidates)
+            reduce_puzzle = instrument.wrap(reduce_puzzle, 'reduce_puzzle',
+                                            stats, _candidates)
+        pipeline = [named[name] for name in strategies]
+
+        return (eliminate, only_choice, naked_siblings, naked_twins,
+                hidden_subsets, pointing_pairs, box_line, fish, x_wing,
+                swordfish, reduce, reduce_puzzle)
+
+    (eliminate, only_choice, naked_siblings, naked_twins, hidden_subsets,
+     pointing_pairs, box_line, fish, x_wing, swordfish, reduce,
+     reduce_puzzle) = _reducers(assign_fn)
+
+
+    def search(values, mode='copy', stats=None):
         """
-        Go through all the units, and whenever there is a unit with a value that
-        only fits in one box, assign the value to this box.
-        Input: A sudoku in dictionary form.
-        Output: The resulting sudoku in dictionary form.
+        Solve a Sudoku puzzle by using depth-first search and propogation.
+
+        Input:
+            - values: A sudoku in dictionary form.
+            - mode: 'copy' gives each branch of the search its own copy of
+              the puzzle; 'trail' changes values in place, recording each
+              change on a trail and undoing them when it backtracks.
+            - stats: Optional dict, to which the numbers of nodes visited,
+              backtracks and rounds of propagation, the maximum depth, the
+              candidates removed by each strategy and the time spent in
+              each are added; see the instrument module. Without it, the
+              search isn't instrumented at all.
+        Output: The solved sudoku in dictionary form, or None.
         """
-        singles = []
-        for unit in unitlist:
-            all_vals = set(''.join([values[box] for box in unit]))
-            for digit in all_vals:
-                locations = [box for box in unit if digit in values[box]]
-                if len(locations) == 1:
-                    singles.append((digit, locations[0]))
-        for digit, box in set(singles):
-            assign_fn(values, box, digit)
-        return values
-
-    def naked_siblings(values, num_siblings=None):
-        """Generalisation of the naked twins strategy.
-
-        If a unit contains n identical cells, with each containing n options,
-        eliminate those options from all the other cells in that unit."""
-        if num_siblings is not None:
-            assert 2 <= num_siblings <= (dim-1)
-
-        for unit in unitlist:
-            unit_values = [(box, tuple(sorted(values[box]))) for box in unit]
-            unit_values = sorted(unit_values, key = lambda v: len(v[1]))
-
-            siblings = {}
-            for box, digits in unit_values:
-                num_digits = len(digits)
-                if num_siblings is not None:
-                    if num_digits  > num_siblings: break
-                    if num_digits != num_siblings: continue
-                if digits not in siblings:
-                    siblings[digits] = set([])
-                siblings[digits].add(box)
-
-            for digits, boxes in siblings.items():
-                if len(digits) > 1 and len(digits) == len(boxes):
-                    # We've found our n identical cells!
-                    digits = set(digits)
-                    for box, old_value in unit_values:
-                        if box in boxes: continue
-                        value = ''.join(sorted(set(old_value) - digits))
-                        assign_fn(values, box, ''.join(sorted(value)))
-
-        return values
-
-    def naked_twins(values):
-        """Eliminate values using the naked twins strategy.
-
-        'Naked twins' are two cells in a unit which both contain the same two
-        values. These two values can't appear in any other cells, so remove
-        them from all other cells.
-
-        Here's an example: If two cells each contain the two options 2 and 3 -
-        one of those cells must contain the 2, and the other the 3; no other
-        cell in that unit can. Therefore we can eliminate those values from the
-        other cells!
-
-        Args:
-            values:
-                The dictionary representation of a Sudoku puzzle
-                ({'box-co-ords': symbol-string, ...}
-
-        Returns:
-            the values dictionary with the naked twins eliminated from peers.
+        if mode not in ('copy', 'trail'):
+            raise ValueError("Unknown search mode %r" % mode)
+        if stats is not None:
+            instrument.start(stats)
+            start = time.perf_counter()
+        if mode == 'copy':
+            answer = next(_solutions(values, stats), None)
+        else:
+            answer = values if _search_trail(values, stats) else None
+        if stats is not None:
+            instrument.add(stats, 'time', 'search', time.perf_counter() - start)
+        return answer
+
+    def choose(values):
         """
+        Choose one of the unfilled squares with the fewest possibilities.
 
-        # Find all instances of naked twins
-        # Eliminate the naked twins as possibilities for their peers
-        return naked_siblings(values, 2)
-
-    def reduce(values):
-        """One round of each of the reduction functions."""
-        values = naked_siblings(values)
-        values = only_choice(values)
-        values = eliminate(values)
-        return values
+        Of those, the one with the most unfilled peers is chosen, as
+        filling it constrains the most others; any tie left is broken by
+        box name. The search itself keeps its choices up to date in Buckets
+        rather than calling this at every node, but chooses the same way.
 
-    def reduce_puzzle(values):
-        """
-        Iterate eliminate() and only_choice(). If at some point, there is a box
-        with no available values, return False.
-        If the sudoku is solved, return the sudoku.
-        If after an iteration of both functions, the sudoku remains the same,
-        return the sudoku.
         Input: A sudoku in dictionary form.
-        Output: The resulting sudoku in dictionary form.
+        Output: (box, possible values) for the chosen box, or None if every
+                box is filled. With lcv, the values are in the order the
+                search would try them.
         """
-        # The original definition of 'remains the same' doesn't quite work.
-        # It was just a count of how many cells had been reduced to 1 char.
-        # But what about reductions that reduce the possibilities in other
-        # cells, such that the next iteration would reduce them? And whether
-        # this happens or not also depends on the order the reductions are
-        # performed; if you do only_choice, then eliminate, you might be able
-        # to have another round, whereas if you do eliminate first, then
-        # only_choice, this won't happen.
-
-        # To make the order of reductions irrelevant, we'll expand the original
-        # definition of 'remains the same'. If the reductions seem to have
-        # stalled (no more cells reduced to one) do one more set of reductions,
-        # and only exit if that results in no change.
-
-        stalled = False
-        stalled_flag = False
+        unsolved = [(len(vals), box) for box, vals in values.items()
+                    if len(vals) > 1]
+        if not unsolved:
+            return None
+        fewest = min(unsolved)[0]
+        degree = lambda box: sum(1 for peer in peers[box]
+                                 if len(values[peer]) > 1)
+        box = min((-degree(box), box) for count, box in unsolved
+                  if count == fewest)[1]
+        return box, _order(values, box)
+
+    def _order(values, box):
+        # The candidates of box, in the order to try them: with lcv, those
+        # in the fewest of its unsolved peers first.
+        vals = values[box]
+        if not lcv:
+            return vals
+        open_peers = [values[peer] for peer in peers[box]
+                      if len(values[peer]) > 1]
+        return ''.join(sorted(vals, key=lambda v: sum(v in peer
+                                                      for peer in open_peers)))
+
+    def _buckets(values):
+        return Buckets([len(values[box]) for box in box_order], peer_ids)
+
+    def _solutions(values, stats=None):
+        # Depth-first search, keeping the choices still to be tried on an
+        # explicit stack rather than recursing, so deep searches on the
+        # bigger puzzles neither hit the recursion limit nor pay for a call
+        # frame per node. Each stack entry is (values, buckets, box, digits
+        # left). The boxes each reduction changes are noted, so that only
+        # they need moving in the buckets.
+        touched = []
+
+        def track(values, box, value):
+            touched.append(box)
+            assign_fn(values, box, value)
+        reduce = _reducers(track, stats)[-1]
+        buckets = None
+        stack = []
         while True:
-            solved_before = len(_boxes_with_val_len(values, 1))
+            if stats is not None:
+                stats['nodes'] += 1
+                stats['max_depth'] = max(stats['max_depth'], len(stack))
             values = reduce(values)
-            if len(_boxes_with_val_len(values, 0)):
-                return False
-            solved_after = len(_boxes_with_val_len(values, 1))
+            if isinstance(values, dict):
+                if buckets is None:
+                    buckets = _buckets(values)
+                else:
+                    buckets.update((box_ids[box], len(values[box]))
+                                   for box in touched)
+                cell = buckets.best()
+                if cell is None:
+                    yield values
+                else:
+                    box = box_order[cell]
+                    stack.append((values, buckets, box, _order(values, box)))
+            elif stats is not None:
+                stats['backtracks'] += 1
+
+            while stack and not stack[-1][3]:
+                stack.pop()
+            if not stack:
+                return
+            parent, buckets, box, vals = stack[-1]
+            stack[-1] = (parent, buckets, box, vals[1:])
+            values = parent.copy()
+            if vals[1:]:
+                # The last digit can have the parent's buckets.
+                buckets = buckets.copy()
+            del touched[:]
+            track(values, box, vals[0])
+
+    def _search_trail(values, stats):
+        # As _solutions(), but in place. Each stack entry is (box, digits
+        # left, trail length before the box was assigned). The buckets are
+        # kept up to date with the boxes on the trail: those changed by a
+        # reduction that succeeds, and those put back by an undo.
+        reduce = reduce_puzzle
+        if stats is not None:
+            stats['nodes'] += 1
+            reduce = _reducers(assign_fn, stats)[-1]
+        # Nothing above the root to backtrack to, so only start recording
+        # changes once we branch.
+        solvable = isinstance(reduce(values), dict)
+        if solvable:
+            buckets = _buckets(values)
+        trail = []
+        stack = []
+
+        def record(values, box, value):
+            if values[box] != value:
+                trail.append((box, values[box]))
+            assign_fn(values, box, value)
+        reduce_recorded = _reducers(record, stats)[-1]
 
-            stalled = solved_before == solved_after
-            # print 'Stalled flags:', (stalled, stalled_flag)
-            # print 'Values before/after: %d/%d' % (solved_before, solved_after)
-            if stalled:
-                if stalled_flag:
+        while True:
+            if stats is not None and not solvable:
+                stats['backtracks'] += 1
+            if solvable:
+                cell = buckets.best()
+                if cell is None:
+                    return True
+                box = box_order[cell]
+                stack.append((box, _order(values, box), len(trail)))
+
+            while stack:
+                box, vals, mark = stack[-1]
+                undone = [box for box, _ in trail[mark:]]
+                _undo(values, trail, mark)
+                buckets.update((box_ids[box], len(values[box]))
+                               for box in undone)
+                if vals:
                     break
-                else:
-                    stalled_flag = True
+                stack.pop()
             else:
-                stalled_flag = False
-
-        return values
+                return False
 
-    def search(values):
-        """Solve a Sudoku puzzle by using depth-first search and propogation."""
+            stack[-1] = (box, vals[1:], mark)
+            record(values, box, vals[0])
+            if stats is not None:
+                stats['nodes'] += 1
+                stats['max_depth'] = max(stats['max_depth'], len(stack))
+            solvable = isinstance(reduce_recorded(values), dict)
+            if solvable:
+                buckets.update((box_ids[box], len(values[box]))
+                               for box, _ in trail[mark:])
+
+    def iter_solutions(values):
+        """
+        Generate all the solutions of a Sudoku puzzle, one at a time.
 
-        # First, reduce the puzzle using the previous function
-        values = reduce_puzzle(values)
-        if not isinstance(values, dict):
-            return
+        Solutions are found by the same depth-first search as search(), and
+        each is yielded as soon as it is found, so the caller can stop at any
+        point without the rest of the search tree being explored. Unlike
+        search(), values itself is left as it is.
+        """
+        return _solutions(values.copy())
 
-        count = [(len(vals), box, vals) for box, vals in values.items()]
-        count = sorted(count)
-        count = [tup for tup in count if tup[0] > 1]
-        if not count:
-            # Problem must already be solved
-            return values
+    def count_solutions(values, limit=2):
+        """
+        Count the solutions of a Sudoku puzzle, by exhaustive search.
 
-        # Choose one of the unfilled squares with the fewest possibilities
-        _, box, vals = count.pop(0)
-        for digit in vals:
-            # Now use recursion to solve each one of the resulting sudokus,
-            # and if one returns a value (not False), return that answer!
-            new_values = values.copy()
-            new_values[box] = digit
-            answer = search(new_values)
-            if isinstance(answer, dict):
-                return answer
+        Input:
+            - values: A sudoku in dictionary form.
+            - limit: Stop searching once this many solutions have been found.
+              None to count them all.
+        Output: The number of solutions found.
+        """
+        return sum(1 for _ in islice(iter_solutions(values), limit))
 
     functions = {}
     for name, obj in locals().items():
         if isinstance(obj, fn_type) and not name.startswith('_'):
             functions[name] = obj
+
+    functions.update(canonical.init(side, symbols, boxes, wildcard, diagonal))
+    functions.update(encoding.init(side, symbols, boxes))
+
+    if engine == 'bitmask':
+        functions.update(bitmask.init(side, symbols, boxes, unitlist, peers,
+                                      lcv))
+    elif engine == 'dlx':
+        functions.update(dlx.init(side, symbols, boxes, unitlist))
+
+    if vectorized is not None:
+        functions.update(vectorized.init(side, symbols, boxes, unitlist,
+                                         wildcard, functions['search'],
+                                         grid_values))
+
+    _count_solutions = functions['count_solutions']
+
+    def is_unique(grid, wildcard=wildcard):
+        """Whether the Sudoku grid, in string form, has exactly 1 solution."""
+        return _count_solutions(grid_values(grid, wildcard), 2) == 1
+
+    functions['is_unique'] = is_unique
     return functions
 
 functions = init(3, diagonal=True)
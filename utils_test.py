@@ -1,11 +1,18 @@
+import bitmask
+import random
+import sys
+import traceback
 import utils
 import unittest
+from itertools import islice, product
 
 
 class AttachUtils(object):
+    engine = 'string'
+
     @classmethod
     def utils_init(cls, side, wildcard='.', diagonal=False):
-        functions = utils.init(side, wildcard, diagonal)
+        functions = utils.init(side, wildcard, diagonal, engine=cls.engine)
         for name, fn in functions.items():
             setattr(cls, name, staticmethod(fn))
 
@@ -54,6 +61,14 @@ class TestGridParsing(unittest.TestCase, AttachUtils):
         self.assertEqual(check, output)
         self.assertEqual(separator, '----------+----------')
 
+    def test_values_string(self):
+        self.utils_init(4)
+
+        grid = '0.a' + '.' * 250 + 'f1e'
+        values = self.grid_values(grid)
+        self.assertEqual(self.values_string(values), grid)
+        self.assertEqual(self.values_string(values, '_'), grid.replace('.', '_'))
+
 
 class TestElimination(unittest.TestCase, AttachUtils):
 
@@ -250,17 +265,19 @@ class TestSearch(unittest.TestCase, AttachUtils):
         # Example taken from course notes/coding example.
         input = self.grid_values(self.input)
 
-        answer = self.grid_values(r"""2 3 9 |8 7 4 |1 5 6
-                                      7 5 4 |3 1 6 |2 9 8
-                                      6 8 1 |9 5 2 |3 7 4
+        # Without the diagonals the puzzle has many solutions; this is the
+        # first one the search comes to.
+        answer = self.grid_values(r"""2 7 4 |8 1 9 |3 5 6
+                                      8 5 9 |3 7 6 |2 4 1
+                                      6 3 1 |4 2 5 |9 7 8
                                       ------+------+------
-                                      4 7 6 |1 2 8 |5 3 9
-                                      3 1 2 |4 9 5 |6 8 7
-                                      5 9 8 |6 3 7 |4 1 2
+                                      4 9 6 |7 5 8 |1 3 2
+                                      3 8 2 |1 9 4 |5 6 7
+                                      5 1 7 |6 3 2 |4 8 9
                                       ------+------+------
-                                      1 4 3 |7 6 9 |8 2 5
-                                      9 6 5 |2 8 3 |7 4 1
-                                      8 2 7 |5 4 1 |9 6 3""")
+                                      7 4 3 |9 6 1 |8 2 5
+                                      1 6 5 |2 8 3 |7 9 4
+                                      9 2 8 |5 4 7 |6 1 3""")
 
         values = self.search(input)
         self.assertEqual(answer, values)
@@ -285,6 +302,233 @@ class TestSearch(unittest.TestCase, AttachUtils):
         self.assertEqual(answer, values)
 
 
+class TestSearchModes(unittest.TestCase, AttachUtils):
+
+    def test_search_modes(self):
+        self.utils_init(3, diagonal=False)
+        results = []
+        for mode in ['copy', 'trail']:
+            stats = {}
+            values = self.search(self.grid_values(TestSearch.input), mode, stats)
+            # Timings will differ from run to run.
+            self.assertGreater(stats.pop('time')['search'], 0)
+            results.append((values, stats))
+        self.assertEqual(results[0], results[1])
+        self.assertGreater(results[0][1]['nodes'], 1)
+        self.assertRaises(ValueError, self.search, {}, 'copies')
+
+    def test_stats(self):
+        self.utils_init(3)
+        hard = '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..'
+        stats = {}
+        self.search(self.grid_values(hard), 'copy', stats)
+        for key in ['nodes', 'backtracks', 'max_depth']:
+            self.assertGreater(stats[key], 0)
+        self.assertLess(stats['backtracks'], stats['nodes'])
+        for name, removed in stats['removed'].items():
+            self.assertGreater(removed, 0)
+            self.assertLessEqual(stats['time'][name], stats['time']['search'])
+
+        # Stats add up over searches.
+        nodes = stats['nodes']
+        self.search(self.grid_values(hard), 'trail', stats)
+        self.assertEqual(stats['nodes'], 2 * nodes)
+
+    def test_deep_search(self):
+        # Filling an empty 16x16 board takes well over a hundred nested
+        # choices; the search mustn't need a stack frame for each of them.
+        self.utils_init(4)
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(len(traceback.extract_stack()) + 100)
+        try:
+            for mode in ['copy', 'trail']:
+                stats = {}
+                answer = self.search(self.grid_values('.' * 256), mode, stats)
+                self.assertGreater(stats['nodes'], 100)
+                self.assertEqual(self.eliminate(answer.copy()), answer)
+        finally:
+            sys.setrecursionlimit(limit)
+
+
+class TestSearchStats(unittest.TestCase, AttachUtils):
+
+    def test_strategies(self):
+        self.utils_init(3)
+        hard = '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..'
+        stats = {}
+        self.search(self.grid_values(hard), 'copy', stats)
+        self.assertGreater(stats['rounds'], stats['nodes'])
+        self.assertEqual(sorted(stats['removed']),
+                         ['eliminate', 'naked_siblings', 'only_choice',
+                          'reduce_puzzle'])
+        self.assertEqual(sorted(stats['time']),
+                         ['eliminate', 'naked_siblings', 'only_choice',
+                          'reduce_puzzle', 'search'])
+
+
+class TestStrategies(unittest.TestCase):
+
+    hard = '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..'
+
+    def test_sound(self):
+        # None of the strategies may remove the solution's symbol from a
+        # box, and each finds something that eliminating and single
+        # choices miss on the way to solving this puzzle.
+        fns = utils.init(3, strategies=['only_choice', 'eliminate'])
+        solution = fns['search'](fns['grid_values'](self.hard))
+        for name in utils.strategy_names:
+            if name in ['only_choice', 'eliminate']:
+                continue
+            removed = 0
+            values = fns['grid_values'](self.hard)
+            while True:
+                values = fns['reduce_puzzle'](values)
+                before = sum(len(v) for v in values.values())
+                values = fns[name](values)
+                removed += before - sum(len(v) for v in values.values())
+                for box, digit in solution.items():
+                    self.assertIn(digit, values[box], name)
+                unsolved = sorted(b for b in values if len(values[b]) > 1)
+                if not unsolved:
+                    break
+                values[unsolved[0]] = solution[unsolved[0]]
+            self.assertGreater(removed, 0, name)
+
+    def test_fewer_nodes(self):
+        basic = utils.init(3)
+        stats = {}
+        expected = basic['search'](basic['grid_values'](self.hard), 'copy',
+                                   stats)
+        for mode in ['copy', 'trail']:
+            fns = utils.init(3, strategies=utils.strategy_names)
+            more = {}
+            answer = fns['search'](fns['grid_values'](self.hard), mode, more)
+            self.assertEqual(answer, expected)
+            self.assertLess(more['nodes'], stats['nodes'])
+            self.assertEqual(sorted(more['removed']),
+                             sorted(utils.strategy_names + ('reduce_puzzle',)))
+
+    def test_order(self):
+        fns = utils.init(2, strategies=['eliminate'])
+        values = fns['grid_values'](TestNakedSiblings.input)
+        self.assertEqual(fns['reduce'](values.copy()),
+                         fns['eliminate'](values.copy()))
+        self.assertRaises(ValueError, utils.init, 3, strategies=['guess'])
+        self.assertRaises(ValueError, utils.init, 3, engine='bitmask',
+                          strategies=['eliminate'])
+
+
+class TestScheduler(unittest.TestCase):
+
+    hard = TestStrategies.hard
+
+    def test_fixpoint(self):
+        # Whatever the order, reduce_puzzle() stops only when none of the
+        # strategies can remove anything more, so ends in the same place.
+        results = []
+        for order in [None, utils.strategy_names[::-1], 'learned']:
+            fns = utils.init(3, strategies=utils.strategy_names, order=order)
+            for _ in range(2):
+                values = fns['reduce_puzzle'](fns['grid_values'](self.hard))
+                self.assertEqual(fns['reduce'](values.copy()), values)
+                results.append(values)
+        for values in results[1:]:
+            self.assertEqual(values, results[0])
+
+    def test_learned(self):
+        fns = utils.init(3, strategies=utils.strategy_names, order='learned')
+        fns['search'](fns['grid_values'](self.hard))
+        profile = fns['strategy_profile']()
+        self.assertEqual(sorted(profile), sorted(utils.strategy_names))
+        rates = [p['removed'] / p['seconds'] for p in profile.values()]
+        self.assertEqual(rates, sorted(rates, reverse=True))
+        self.assertEqual(list(profile)[0], 'eliminate')
+
+    def test_budgets(self):
+        fns = utils.init(3, diagonal=True)
+        full = fns['reduce_puzzle'](fns['grid_values'](TestSearch.input))
+        fns = utils.init(3, diagonal=True,
+                         budgets={'naked_siblings': 0, 'only_choice': 1})
+        values = fns['reduce_puzzle'](fns['grid_values'](TestSearch.input))
+        profile = fns['strategy_profile']()
+        self.assertEqual(profile['naked_siblings']['runs'], 0)
+        self.assertEqual(profile['only_choice']['runs'], 1)
+        for box, value in full.items():
+            self.assertTrue(set(value) <= set(values[box]))
+        self.assertNotEqual(values, full)
+
+    def test_bad_arguments(self):
+        self.assertRaises(ValueError, utils.init, 3, order=['eliminate'])
+        self.assertRaises(ValueError, utils.init, 3,
+                          budgets={'swordfish': 1})
+        self.assertRaises(ValueError, utils.init, 3, engine='bitmask',
+                          order='learned')
+
+
+class TestChoose(unittest.TestCase):
+
+    hard = TestStrategies.hard
+
+    def test_degree(self):
+        # Of the boxes with the fewest candidates, the one with the most
+        # unsolved peers is chosen, whatever its name.
+        fns = utils.init(2)
+        values = fns['grid_values']('.' * 16)
+        values.update(A1='12', D4='12', A2='3', A3='4', A4='2', B1='3',
+                      C1='4', D1='2', B2='4')
+        self.assertEqual(fns['choose'](values), ('D4', '12'))
+        # With no unsolved peers either, it's down to the name.
+        values.update(D2='1', D3='3', B4='1', C4='3', C3='1')
+        self.assertEqual(fns['choose'](values), ('A1', '12'))
+        self.assertIsNone(fns['choose'](dict.fromkeys(values, '1')))
+
+    def test_lcv(self):
+        # Fewer of A1's peers have 3 as a candidate, so it's tried first.
+        values = utils.init(2)['grid_values']('.' * 16)
+        values.update(A1='23', A2='124', A3='124')
+        for lcv, vals in [(False, '23'), (True, '32')]:
+            fns = utils.init(2, lcv=lcv)
+            self.assertEqual(fns['choose'](values), ('A1', vals))
+
+    def test_search(self):
+        # The search chooses as choose() does, so with or without lcv, both
+        # engines and both modes take the same number of nodes.
+        for lcv in [False, True]:
+            results = []
+            for engine in ['string', 'bitmask']:
+                fns = utils.init(3, engine=engine, lcv=lcv)
+                for mode in ['copy', 'trail']:
+                    stats = {}
+                    answer = fns['search'](fns['grid_values'](self.hard),
+                                           mode, stats)
+                    results.append((answer, stats['nodes']))
+            for result in results[1:]:
+                self.assertEqual(result, results[0])
+        self.assertRaises(ValueError, utils.init, 3, engine='dlx', lcv=True)
+
+
+class TestTrailIsolation(unittest.TestCase):
+
+    def test_other_reductions(self):
+        # Reductions run on other puzzles while a trail search is under way
+        # mustn't end up on its trail.
+        hard = '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..'
+        calls = []
+
+        def assign(values, box, value):
+            values[box] = value
+            calls.append(box)
+            if len(calls) == 1000:
+                fns['eliminate'](fns['grid_values'](' '.join('1' * 81)))
+                del calls[:]
+
+        fns = utils.init(3, assign_fn=assign)
+        answer = fns['search'](fns['grid_values'](hard), 'trail')
+
+        expected = utils.init(3)['search'](fns['grid_values'](hard))
+        self.assertEqual(answer, expected)
+
+
 class TestNakedSiblings(unittest.TestCase, AttachUtils):
 
     input = r"""134 34 |123 .
@@ -296,8 +540,9 @@ class TestNakedSiblings(unittest.TestCase, AttachUtils):
     def test_naked_siblings(self):
         self.utils_init(2)
 
+        # The square's {134}, {34} and {134} are a naked triple too.
         check = r"""134 34 |123 1234
-                    134 12 |123 1234
+                    134  2 |123 1234
                     -------+---------
                       2 12 |123 1234
                     134 34 |  4 1234"""
@@ -306,6 +551,15 @@ class TestNakedSiblings(unittest.TestCase, AttachUtils):
         values = self.naked_siblings(input)
         self.assertEqual(values, self.grid_values(check))
 
+    def test_naked_unions(self):
+        # Cells needn't be identical to make a naked subset.
+        self.utils_init(2)
+        values = self.grid_values('12 23 13 . ' + '. ' * 12)
+        check = self.grid_values('12 23 13 4 ' + '. ' * 12)
+        self.assertEqual(self.naked_siblings(values), check)
+        values = self.grid_values('12 23 13 . ' + '. ' * 12)
+        self.assertEqual(self.naked_siblings(values, 2), values)
+
     def test_naked_twins(self):
         self.utils_init(2)
 
@@ -324,6 +578,53 @@ class TestNakedSiblings(unittest.TestCase, AttachUtils):
         values = self.naked_twins(input)
         self.assertEqual(values, check)
 
+class TestCountSolutions(unittest.TestCase, AttachUtils):
+
+    def test_count_solutions(self):
+        self.utils_init(3, diagonal=True)
+        values = self.grid_values(TestSearch.input)
+        self.assertEqual(self.count_solutions(values), 1)
+        self.assertTrue(self.is_unique(TestSearch.input))
+
+        self.utils_init(3, diagonal=False)
+        self.assertEqual(self.count_solutions(self.grid_values(TestSearch.input)), 2)
+        self.assertFalse(self.is_unique(TestSearch.input))
+
+        self.utils_init(2)
+        empty = '.' * 16
+        self.assertEqual(self.count_solutions(self.grid_values(empty), None), 288)
+        self.assertEqual(self.count_solutions(self.grid_values(empty), 5), 5)
+        self.assertEqual(self.count_solutions(self.grid_values(empty), 1), 1)
+
+        values = self.grid_values(empty)
+        values['A1'] = values['A2'] = '1'
+        self.assertEqual(self.count_solutions(values), 0)
+
+    def test_input_untouched(self):
+        self.utils_init(3, diagonal=True)
+        values = self.grid_values(TestSearch.input)
+        before = values.copy()
+        self.count_solutions(values)
+        self.assertEqual(values, before)
+        next(self.iter_solutions(values))
+        self.assertEqual(values, before)
+
+    def test_iter_solutions(self):
+        self.utils_init(2)
+        solutions = list(self.iter_solutions(self.grid_values('.' * 16)))
+        self.assertEqual(len(solutions), 288)
+        self.assertEqual(len(set(tuple(sorted(s.items())) for s in solutions)), 288)
+        for solution in solutions:
+            self.assertEqual(self.eliminate(solution.copy()), solution)
+
+        # Without the diagonals this puzzle has thousands of solutions; the
+        # generator should hand over the first few without finding the rest.
+        self.utils_init(3, diagonal=False)
+        solutions = self.iter_solutions(self.grid_values(TestSearch.input))
+        first, second = islice(solutions, 2)
+        self.assertNotEqual(first, second)
+        solutions.close()
+
 class TestHexaSudoku(unittest.TestCase, AttachUtils):
     def test_hexa(self):
         self.utils_init(4, wildcard='_')
@@ -371,5 +672,182 @@ class TestHexaSudoku(unittest.TestCase, AttachUtils):
         values = self.search(input)
         self.assertEqual(values, self.grid_values(solution))
 
+
+class TestBitmaskEngine(unittest.TestCase, AttachUtils):
+    engine = 'bitmask'
+
+    def test_masks_round_trip(self):
+        self.utils_init(3)
+        values = self.grid_values(TestSearch.input)
+        masks = self.values_masks(values)
+        self.assertEqual(masks['A1'], 1 << 1)
+        self.assertEqual(masks['A2'], (1 << 9) - 1)
+        self.assertEqual(self.masks_values(masks), values)
+
+    def test_propagate(self):
+        self.utils_init(3)
+        values = self.reduce_puzzle(self.grid_values(TestSearch.input))
+        box = min(b for b in values if len(values[b]) > 1)
+        digit = values[box][0]
+
+        full = values.copy()
+        full[box] = digit
+        full = self.reduce_puzzle(full)
+
+        changed = values.copy()
+        changed[box] = digit
+        self.assertEqual(self.propagate(changed, [box]), full)
+
+        values = self.grid_values(TestSearch.input)
+        values['A2'] = '2'
+        self.assertFalse(self.propagate(values, ['A2']))
+
+    def test_naked_removals(self):
+        # A candidate should be removed just when no way of giving the
+        # unsolved cells different symbols gives it to its cell.
+        rng = random.Random(0)
+        for _ in range(300):
+            masks = [rng.randrange(1, 64) for _ in range(6)]
+            unsolved = [pos for pos, mask in enumerate(masks)
+                        if bitmask.popcount(mask) > 1]
+            choices = [list(bitmask.bits(masks[pos])) for pos in unsolved]
+            kept = dict((pos, 0) for pos in unsolved)
+            for picks in product(*choices):
+                if len(set(picks)) == len(picks):
+                    for pos, bit in zip(unsolved, picks):
+                        kept[pos] |= bit
+            removals = bitmask.naked_removals(masks)
+            if unsolved and not any(kept.values()):
+                self.assertIsNone(removals, masks)
+                continue
+            expected = dict((pos, masks[pos] & ~bits)
+                            for pos, bits in kept.items()
+                            if masks[pos] & ~bits)
+            self.assertEqual(removals, expected, masks)
+
+    def test_assign_fn_unsupported(self):
+        self.assertRaises(ValueError, utils.init, 3, assign_fn=lambda *a: 0,
+                          engine='bitmask')
+
+
+    def test_deep_search(self):
+        # An empty 25x25 board takes hundreds of nested choices to fill; the
+        # search mustn't need a stack frame for each of them.
+        self.utils_init(5)
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(200)
+        try:
+            for mode in ['copy', 'trail']:
+                stats = {}
+                answer = self.search(self.grid_values('.' * 625), mode, stats)
+                self.assertGreater(stats['nodes'], 200)
+                self.assertEqual(self.eliminate(answer.copy()), answer)
+        finally:
+            sys.setrecursionlimit(limit)
+
+
+class TestEliminationBitmask(TestElimination):
+    engine = 'bitmask'
+
+class TestOnlyChoiceBitmask(TestOnlyChoice):
+    engine = 'bitmask'
+
+class TestReduceBitmask(TestReduce):
+    engine = 'bitmask'
+
+class TestSearchBitmask(TestSearch):
+    engine = 'bitmask'
+
+class TestSearchModesBitmask(TestSearchModes):
+    engine = 'bitmask'
+
+class TestSearchModesDLX(TestSearchModes):
+    engine = 'dlx'
+
+class TestNakedSiblingsBitmask(TestNakedSiblings):
+    engine = 'bitmask'
+
+class TestCountSolutionsBitmask(TestCountSolutions):
+    engine = 'bitmask'
+
+class TestHexaSudokuBitmask(TestHexaSudoku):
+    engine = 'bitmask'
+
+class TestSearchDLX(TestSearch):
+    engine = 'dlx'
+
+    def test_search(self):
+        # Without the diagonals this puzzle has more than one solution, and
+        # DLX needn't find the same one first.
+        self.utils_init(3, diagonal=False)
+        values = self.grid_values(self.input)
+        answer = self.search(values.copy())
+        for box, value in values.items():
+            self.assertIn(answer[box], value)
+        self.assertEqual(self.eliminate(answer.copy()), answer)
+
+class TestCountSolutionsDLX(TestCountSolutions):
+    engine = 'dlx'
+
+class TestHexaSudokuDLX(TestHexaSudoku):
+    engine = 'dlx'
+
+class TestDLXEngine(unittest.TestCase, AttachUtils):
+    engine = 'dlx'
+
+    def test_no_solution(self):
+        self.utils_init(3)
+        values = self.grid_values(TestSearch.input)
+        values['A2'] = '2'
+        self.assertIsNone(self.search(values))
+
+    def test_candidates(self):
+        self.utils_init(2)
+        values = self.grid_values('1... .... .... ....')
+        values['A2'] = '3'
+        values['B1'] = '4'
+        answer = self.search(values)
+        self.assertEqual(answer['A2'], '3')
+        self.assertEqual(answer['B1'], '4')
+        # A valid solution has nothing left to eliminate.
+        self.assertEqual(self.eliminate(answer.copy()), answer)
+
+@unittest.skipIf(utils.vectorized is None, 'NumPy is not installed')
+class TestVectorized(unittest.TestCase, AttachUtils):
+
+    easy = '..3.2.6..9..3.5..1..18.64....81.29..7.......8..67.82....26.95..8..2.3..9..5.1.3..'
+    hard = '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..'
+    clash = '88' + '.' * 79
+
+    def test_propagate_array(self):
+        self.utils_init(3)
+        cands = self.grids_array([self.easy, self.hard, self.clash])
+        self.assertEqual(cands.shape, (3, 81, 9))
+        self.assertEqual(list(self.propagate_array(cands)), [1, 0, -1])
+        self.assertEqual(self.array_values(cands[0]),
+                         self.search(self.grid_values(self.easy)))
+        self.assertEqual(self.array_values(cands[1]),
+                         self.reduce_puzzle(self.grid_values(self.hard)))
+
+    def test_solve_batch(self):
+        diagonal = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+        grids = [diagonal, TestSearch.input, self.hard, self.clash]
+        grids = [grid.replace('.', '_') for grid in grids]
+        for engine in utils.engines:
+            fns = utils.init(3, '_', diagonal=True, engine=engine)
+            check = [fns['search'](fns['grid_values'](grid)) for grid in grids]
+            solutions = fns['solve_batch'](iter(grids), batch=3)
+            self.assertEqual(list(solutions), check)
+
+    def test_grids_array(self):
+        self.utils_init(2)
+        cands = self.grids_array(['1___' * 4, '12 34 _ 3 ' + '_' * 12], '_')
+        self.assertEqual(self.array_values(cands[0]),
+                         self.grid_values('1...' * 4))
+        self.assertEqual(self.array_values(cands[1]),
+                         self.grid_values('12 34 _ 3 ' + '_' * 12, '_'))
+        self.assertRaises(ValueError, self.grids_array, ['5' * 16])
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""
+NumPy versions of eliminate() and only_choice(), run over a whole batch of
+puzzles at once.
+
+A batch of N puzzles is a boolean array of shape (N, boxes, symbols), where
+cands[n, i, k] is set if symbols[k] is still a candidate for box i (in the
+order of `boxes`) of puzzle n. The units are held as an array of box
+indices, and each box's units as an array of unit indices, so that each
+strategy is a few array operations over every box of every puzzle, rather
+than a Python loop per box.
+"""
+
+from itertools import islice
+
+import numpy as np
+
+fn_type = type(lambda x:0)
+
+
+def init(side, symbols, boxes, unitlist, wildcard, search, grid_values):
+    """
+    Create the batch functions for a puzzle topology.
+
+    Takes the symbols, boxes, units and wildcard built by utils.init(), and
+    the search() and grid_values() functions of the chosen engine, and
+    returns a dictionary of function closures to be merged with the rest.
+    """
+    dim = side * side
+    num_boxes = len(boxes)
+    num_units = len(unitlist)
+
+    index = dict((box, i) for i, box in enumerate(boxes))
+    symbol_idx = dict((s, k) for k, s in enumerate(symbols))
+    unit_idx = np.array([[index[box] for box in unit] for unit in unitlist])
+
+    # The units of each box, and the box's position within each of them. With
+    # diagonals, some boxes are in more units than others, so the rest are
+    # padded out with a dummy unit, num_units, which never holds anything.
+    box_units = [[] for _ in boxes]
+    for u, unit in enumerate(unitlist):
+        for pos, box in enumerate(unit):
+            box_units[index[box]].append((u, pos))
+    most = max(len(units) for units in box_units)
+    unit_of = np.full((num_boxes, most), num_units)
+    pos_in = np.zeros((num_boxes, most), int)
+    for i, units in enumerate(box_units):
+        for j, (u, pos) in enumerate(units):
+            unit_of[i, j] = u
+            pos_in[i, j] = pos
+
+    # Rows of candidates for each character code: a single symbol, all of
+    # them for the wildcard, or none for anything else.
+    lookup = np.full(256, dim + 1)
+    for k, s in enumerate(symbols):
+        lookup[ord(s)] = k
+    code_cands = np.vstack([np.eye(dim, dtype=bool), np.ones((1, dim), bool),
+                            np.zeros((1, dim), bool)])
+
+    def _pad_unit(a):
+        # Append the dummy unit to an array indexed by [puzzle, unit, ...].
+        return np.concatenate([a, np.zeros_like(a[:, :1])], 1)
+
+    def _round(cands):
+        # One round of eliminate() and only_choice() over cands, in place.
+        # Returns which puzzles are still consistent.
+        solved = cands.sum(2, dtype=np.uint8) == 1
+
+        placed = (cands & solved[:, :, None])[:, unit_idx, :]
+        placed = placed.sum(2, dtype=np.uint8)
+        ok = (placed <= 1).all((1, 2))
+        placed = _pad_unit(placed > 0)
+        cands &= ~(placed[:, unit_of, :].any(2) & ~solved[:, :, None])
+
+        in_unit = cands[:, unit_idx, :]
+        counts = in_unit.sum(2, dtype=np.uint8)
+        ok &= counts.all((1, 2))
+        single = _pad_unit(in_unit & (counts == 1)[:, :, None, :])
+        forced = single[:, unit_of, pos_in, :].any(2)
+        ok &= (forced.sum(2, dtype=np.uint8) <= 1).all(1)
+        boxes_forced = forced.any(2)
+        cands[boxes_forced] = forced[boxes_forced]
+
+        ok &= cands.any(2).all(1)
+        return ok
+
+    def grids_array(grids, wildcard=wildcard):
+        """
+        Convert puzzles in string form into an array of candidates.
+
+        Input: A sequence of N grids in string form.
+        Output: A boolean array of shape (N, boxes, symbols).
+        """
+        grids = list(grids)
+        cands = np.zeros((len(grids), num_boxes, dim), bool)
+        plain = [i for i, grid in enumerate(grids) if len(grid) == num_boxes]
+        if plain:
+            text = ''.join(grids[i] for i in plain)
+            codes = np.frombuffer(text.encode('latin-1', 'replace'), np.uint8)
+            table = lookup.copy()
+            table[ord(wildcard)] = dim
+            rows = table[codes.reshape(len(plain), num_boxes)]
+            if (rows > dim).any():
+                raise ValueError('Grids may only hold symbols of this puzzle '
+                                 'and the wildcard')
+            cands[plain] = code_cands[rows]
+
+        for i in sorted(set(range(len(grids))) - set(plain)):
+            values = grid_values(grids[i], wildcard)
+            for j, box in enumerate(boxes):
+                for c in values[box]:
+                    cands[i, j, symbol_idx[c]] = True
+        return cands
+
+    def array_values(cands):
+        """Convert one puzzle's (boxes, symbols) candidates into a dict."""
+        return dict((box, ''.join(symbols[k] for k in np.flatnonzero(row)))
+                    for box, row in zip(boxes, cands))
+
+    def propagate_array(cands):
+        """
+        Repeat eliminate() and only_choice() over a batch of puzzles at once.
+
+        Each round works on all the puzzles which changed in the last one;
+        the rest are left as they are.
+        Input: A boolean array of candidates, shape (N, boxes, symbols),
+               which is changed in place.
+        Output: An array of N statuses: 1 if the puzzle was solved, 0 if
+                propagation stalled short of a solution, or -1 if a
+                contradiction was found.
+        """
+        status = np.zeros(len(cands), np.int8)
+        active = np.arange(len(cands))
+        while active.size:
+            batch = cands[active]
+            before = batch.sum((1, 2))
+            ok = _round(batch)
+            cands[active] = batch
+            after = batch.sum((1, 2))
+            changed = after < before
+
+            # A puzzle is only known to be solved once a round has checked
+            # its last few boxes against each other without changing it.
+            status[active[~ok]] = -1
+            status[active[ok & ~changed & (after == num_boxes)]] = 1
+            active = active[ok & changed]
+        return status
+
+    def solve_batch(grids, wildcard=wildcard, batch=1024):
+        """
+        Solve a stream of puzzles, propagating a batch of them at a time.
+
+        Puzzles that propagation alone can't finish are searched one at a
+        time, with the engine's search().
+        Input:
+            - grids: An iterable of puzzles in string form.
+            - wildcard: The character standing for an empty box in grids.
+            - batch: How many puzzles to propagate at once.
+        Output: A generator of solved sudokus in dictionary form, or None for
+                each puzzle with no solution, in the order of grids.
+        """
+        grids = iter(grids)
+        while True:
+            chunk = list(islice(grids, batch))
+            if not chunk:
+                return
+            cands = grids_array(chunk, wildcard)
+            for puzzle, state in zip(cands, propagate_array(cands)):
+                if state < 0:
+                    yield None
+                elif state > 0:
+                    yield array_values(puzzle)
+                else:
+                    yield search(array_values(puzzle))
+
+    functions = {}
+    for name, obj in locals().items():
+        if isinstance(obj, fn_type) and not name.startswith('_'):
+            functions[name] = obj
+    return functions
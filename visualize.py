@@ -1,17 +1,44 @@
-from PySudoku import play
+def new_frames(assignments):
+    """
+    Generate the frames of a solve in which some box was newly solved.
+
+    assignments may be a journal.Journal, whose deltas say which boxes
+    changed in each frame, or any other iterable of frames in dictionary
+    form, each of which is compared with the one before. Either way the
+    frames are taken one at a time, as they're needed. The frames from a
+    Journal are all the same dictionary, updated in place; copy them to
+    keep them.
+    """
+    if hasattr(assignments, 'steps'):
+        values = assignments.base
+        steps = assignments.steps()
+        next(steps, None)
+        for changes in steps:
+            for box, old, new in changes:
+                values[box] = new
+            if any(len(new) == 1 for box, old, new in changes):
+                yield values
+    else:
+        last = None
+        for values in assignments:
+            if last is not None and any(len(value) == 1 and last[box] != value
+                                        for box, value in values.items()):
+                yield values
+            last = values
+
 
 def visualize_assignments(assignments):
     """ Visualizes the set of assignments created by the Sudoku AI"""
-    last_assignment = None
-    filtered_assignments = []
+    from PySudoku import play
+    play(new_frames(assignments))
+
 
-    for i in range(len(assignments)):
-        if last_assignment:
-            last_assignment_items = [item for item in last_assignment.items() if len(item[1]) == 1]
-            current_assignment_items = [item for item in assignments[i].items() if len(item[1]) == 1]
-            shared_items = set(last_assignment_items) & set(current_assignment_items)
-            if len(shared_items) < len(current_assignment_items):
-                filtered_assignments.append(assignments[i])
-        last_assignment = assignments[i]
+def save_assignments(assignments, path, fps=5):
+    """
+    Render the set of assignments to a GIF or numbered PNG files, headless.
 
-    play(filtered_assignments)
+    See PySudoku.save() for the forms path can take. Returns the number of
+    frames saved.
+    """
+    from PySudoku import save
+    return save(new_frames(assignments), path, fps)
@@ -0,0 +1,143 @@
+import journal
+import os
+import shutil
+import tempfile
+import unittest
+import utils
+import visualize
+
+try:
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    import PySudoku
+except ImportError:
+    pygame = None
+
+try:
+    import PIL
+except ImportError:
+    PIL = None
+
+
+class TestNewFrames(unittest.TestCase):
+
+    diagonal = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.snapshots = []
+        cls.journal = journal.Journal()
+
+        def assign(values, box, value):
+            values[box] = value
+            if len(value) == 1:
+                cls.snapshots.append(values.copy())
+                cls.journal.append(values)
+
+        fns = utils.init(3, diagonal=True, assign_fn=assign)
+        fns['search'](fns['grid_values'](cls.diagonal))
+
+        # The frames picked out by the original filter, which compared the
+        # sets of solved boxes in each pair of frames.
+        cls.check = []
+        for last, values in zip(cls.snapshots, cls.snapshots[1:]):
+            last_items = [item for item in last.items() if len(item[1]) == 1]
+            items = [item for item in values.items() if len(item[1]) == 1]
+            if len(set(last_items) & set(items)) < len(items):
+                cls.check.append(values)
+
+    def test_list(self):
+        frames = list(visualize.new_frames(self.snapshots))
+        self.assertGreater(len(frames), 10)
+        self.assertLess(len(frames), len(self.snapshots))
+        self.assertEqual(frames, self.check)
+
+    def test_journal(self):
+        frames = [values.copy() for values in visualize.new_frames(self.journal)]
+        self.assertEqual(frames, self.check)
+
+    def test_lazy(self):
+        frames = visualize.new_frames(iter(self.snapshots))
+        self.assertEqual(next(frames), self.check[0])
+        self.assertEqual(list(visualize.new_frames(journal.Journal())), [])
+
+
+@unittest.skipIf(pygame is None, 'pygame is not installed')
+class TestRender(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        TestNewFrames.setUpClass()
+
+    def setUp(self):
+        pygame.init()
+        path = os.path.join(os.path.dirname(__file__), 'images',
+                            'sudoku-board-bare.jpg')
+        self.background = pygame.image.load(path)
+
+    def tearDown(self):
+        pygame.quit()
+
+    @property
+    def blank(self):
+        return utils.init(3)['grid_values']('.' * 81)
+
+    def draw(self, frames):
+        # Render the frames, returning the contents of the screen after each.
+        screen = pygame.Surface(self.background.get_size())
+        screen.blit(self.background, (0, 0))
+        images = []
+        for dirty in PySudoku.render(screen, self.background, frames):
+            images.append(pygame.image.tobytes(screen, 'RGB'))
+        return images
+
+    def test_dirty_rects(self):
+        # Redrawing just the changed squares leaves the same picture as
+        # drawing each frame from scratch.
+        frames = [values.copy() for values in
+                  visualize.new_frames(TestNewFrames.journal)]
+        images = self.draw(frames)
+        self.assertEqual(len(images), len(frames))
+        for i in [1, len(frames) // 2, -1]:
+            self.assertEqual(images[i], self.draw([frames[i]])[0])
+        self.assertNotEqual(images[0], images[-1])
+
+    def test_save_png(self):
+        frames = [self.blank] + [TestNewFrames.check[0]] * 2
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'frame%02d.png')
+            self.assertEqual(PySudoku.save(frames, path), 2)
+            self.assertEqual(sorted(os.listdir(directory)),
+                             ['frame00.png', 'frame01.png'])
+            image = pygame.image.load(path % 1)
+            self.assertEqual(pygame.image.tobytes(image, 'RGB'),
+                             self.draw(frames[1:])[0])
+        finally:
+            shutil.rmtree(directory)
+        self.assertRaises(ValueError, PySudoku.save, frames, 'frame.png')
+
+    @unittest.skipIf(PIL is None, 'Pillow is not installed')
+    def test_save_gif(self):
+        from PIL import Image
+        frames = [self.blank] * 3 + [TestNewFrames.check[0]]
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'replay.gif')
+            self.assertEqual(PySudoku.save(frames, path, fps=10), 2)
+            durations = []
+            with Image.open(path) as image:
+                for i in range(image.n_frames):
+                    image.seek(i)
+                    durations.append(image.info['duration'])
+            self.assertEqual(durations, [300, 100])
+
+            snapshots = TestNewFrames.snapshots[:500]
+            count = visualize.save_assignments(snapshots, path)
+            self.assertEqual(count, len(list(visualize.new_frames(snapshots))))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()